@@ -0,0 +1,200 @@
+"""
+Asyncio consumer mode for monitor-queue (CONSUMER_MODE=async).
+
+Keeps up to MAX_IN_FLIGHT forwards running concurrently over one pooled
+keep-alive httpx client. Heartbeats of the same `service` are chained so they
+reach the monitor in stream order, while different services proceed in
+parallel. Each entry is acked only after the monitor answered 2xx; failures are
+retried with the same back-off as the sync consumer and, once MAX_RETRIES is
+exhausted, moved to the dead-letter stream. A 4xx other than 408/429 is
+dead-lettered right away, without holding up the service's chain. In-flight
+entries have their idle time refreshed on every liveness heartbeat, so no other
+consumer reclaims them during a back-off.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import redis
+import redis.asyncio as aioredis
+
+import metrics
+import queues
+from queues import (
+    BLOCK_MS,
+    CONSUMER_GROUP,
+    CONSUMER_HEARTBEAT_S,
+    DLQ_STREAM,
+    JANITOR_INTERVAL_S,
+    LOG_INTERVAL_S,
+    MAX_RETRIES,
+    MONITOR_URL,
+    RECLAIM_INTERVAL_S,
+    REDIS_URL,
+    log,
+)
+
+MAX_IN_FLIGHT   = int(os.getenv("MAX_IN_FLIGHT", 32))
+HTTP_POOL_SIZE  = int(os.getenv("HTTP_POOL_SIZE", MAX_IN_FLIGHT))
+HTTP_TIMEOUT_S  = float(os.getenv("HTTP_TIMEOUT_S", 10))
+
+
+class AsyncForwarder:
+    """Bounded, per-service ordered forwarding of stream entries to the monitor."""
+
+    def __init__(self, r: aioredis.Redis, client: httpx.AsyncClient) -> None:
+        self._r = r
+        self._client = client
+        self._slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+        self._tails: dict = {}
+        self.in_flight: set = set()
+
+    async def submit(self, stream: str, msg_id: str, fields: dict) -> None:
+        """Schedule one entry of `stream`; waits while MAX_IN_FLIGHT forwards are outstanding."""
+        try:
+            payload = json.loads(fields.get("payload", "{}"))
+        except ValueError as exc:
+            await self._dead_letter(stream, msg_id, fields, f"malformed payload: {exc}")
+            return
+
+        await self._slots.acquire()
+        service = str(payload.get("service"))
+        previous = self._tails.get(service)
+        key = (stream, msg_id)
+        self.in_flight.add(key)
+        task = asyncio.create_task(self._forward_after(previous, stream, msg_id, fields, payload))
+        self._tails[service] = task
+        task.add_done_callback(lambda done, service=service: self._release(service, done, key))
+
+    def _release(self, service: str, task: asyncio.Task, key: tuple) -> None:
+        self._slots.release()
+        self.in_flight.discard(key)
+        if self._tails.get(service) is task:
+            del self._tails[service]
+
+    async def _forward_after(
+        self, previous: asyncio.Task | None, stream: str, msg_id: str, fields: dict, payload: dict
+    ) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self._deliver(stream, msg_id, fields, payload)
+        except Exception as exc:
+            # Left unacked: the periodic reclaim pass will pick it up again.
+            log.error("Failed to process message %s: %s", msg_id, exc)
+
+    async def _deliver(self, stream: str, msg_id: str, fields: dict, payload: dict) -> None:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self._client.post(MONITOR_URL, json=payload)
+                response.raise_for_status()
+                metrics.FORWARD_SECONDS.observe(time.perf_counter() - started)
+                break
+            except httpx.HTTPError as exc:
+                metrics.FORWARD_SECONDS.observe(time.perf_counter() - started)
+                if isinstance(exc, httpx.HTTPStatusError) and queues._permanent_failure(
+                    exc.response.status_code
+                ):
+                    await self._dead_letter(stream, msg_id, fields, f"rejected by monitor: {exc}")
+                    return
+                if attempt >= MAX_RETRIES:
+                    log.error("Max retries reached for %s", msg_id)
+                    await self._dead_letter(stream, msg_id, fields, exc)
+                    return
+                wait = queues._backoff(attempt)
+                attempt += 1
+                metrics.RETRIES.inc()
+                log.debug("Forward of %s failed (%s), retry %d in %.1fs", msg_id, exc, attempt, wait)
+                # Only this service's chain waits; other services keep flowing.
+                await asyncio.sleep(wait)
+
+        await self._r.xack(stream, CONSUMER_GROUP, msg_id)
+        metrics.FORWARDED.inc()
+        log.debug("ACK %s  service=%s  status=%s", msg_id, payload.get("service"), payload.get("status"))
+
+    async def _dead_letter(self, stream: str, msg_id: str, fields: dict, error: object) -> None:
+        pipe = self._r.pipeline()
+        pipe.xadd(DLQ_STREAM, queues._dlq_fields(stream, msg_id, fields, error))
+        pipe.delete(queues._error_key(stream, msg_id))
+        pipe.xack(stream, CONSUMER_GROUP, msg_id)
+        await pipe.execute()
+        metrics.DEAD_LETTERED.inc()
+        log.error("Dead-lettered %s to '%s': %s", msg_id, DLQ_STREAM, error)
+
+    async def drain(self) -> None:
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+async def _claim(func, *args) -> list:
+    """Run a blocking claim pass (reclaim or janitor) off the event loop."""
+    try:
+        return await asyncio.to_thread(func, *args)
+    except redis.exceptions.RedisError as exc:
+        log.error("%s failed: %s", func.__name__, exc)
+        return []
+
+
+async def run_async(consumer: str, streams: list) -> None:
+    sync_r = redis.from_url(REDIS_URL, decode_responses=True)
+    queues._ensure_groups(sync_r, streams)
+    queues._warn_shared_streams(sync_r, consumer, streams)
+    r = aioredis.from_url(REDIS_URL, decode_responses=True)
+    limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+    log.info(
+        "Listening on %s as '%s/%s' → %s (async, %d in flight)",
+        ", ".join(f"'{s}'" for s in streams), CONSUMER_GROUP, consumer, MONITOR_URL, MAX_IN_FLIGHT,
+    )
+
+    async with httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT_S) as client:
+        forwarder = AsyncForwarder(r, client)
+        summary = metrics.SummaryLogger(log, LOG_INTERVAL_S)
+        next_reclaim = next_heartbeat = next_janitor = time.monotonic()
+        try:
+            while True:
+                summary.maybe_log()
+                now = time.monotonic()
+                if now >= next_heartbeat:
+                    await asyncio.to_thread(queues._touch_consumer, sync_r, consumer)
+                    # Entries sleeping in a back-off must not look idle to other consumers.
+                    await asyncio.to_thread(queues._keep_held, sync_r, consumer, set(forwarder.in_flight))
+                    next_heartbeat = now + CONSUMER_HEARTBEAT_S
+                if now >= next_reclaim:
+                    for stream in streams:
+                        claimed = await _claim(
+                            queues._claim_stale, sync_r, stream, consumer, set(forwarder.in_flight)
+                        )
+                        for msg_id, fields in claimed:
+                            await forwarder.submit(stream, msg_id, fields)
+                    next_reclaim = time.monotonic() + RECLAIM_INTERVAL_S
+                if now >= next_janitor:
+                    for stream in streams:
+                        claimed = await _claim(queues._reap_dead_consumers, sync_r, stream, consumer)
+                        for msg_id, fields in claimed:
+                            await forwarder.submit(stream, msg_id, fields)
+                    next_janitor = time.monotonic() + JANITOR_INTERVAL_S
+
+                try:
+                    results = await r.xreadgroup(
+                        CONSUMER_GROUP,
+                        consumer,
+                        {stream: ">" for stream in streams},
+                        count=MAX_IN_FLIGHT,
+                        block=min(BLOCK_MS, int(CONSUMER_HEARTBEAT_S * 1000)),
+                    )
+                except redis.exceptions.ConnectionError as exc:
+                    log.error("Redis connection error: %s — retrying in 5s", exc)
+                    await asyncio.sleep(5)
+                    continue
+
+                for stream, messages in results or []:
+                    for msg_id, fields in messages:
+                        await forwarder.submit(stream, msg_id, fields)
+        finally:
+            await forwarder.drain()
+            await r.aclose()
@@ -0,0 +1,168 @@
+"""
+Minimal Prometheus instrumentation for monitor-queue.
+
+Counters and histograms are updated from the consumer loop; stream gauges
+(length, consumer-group lag and pending count) are read from Redis at scrape
+time. `serve()` exposes everything on GET /metrics in the Prometheus text
+format from a daemon thread, and `SummaryLogger` replaces per-message INFO logs
+with one aggregated line every LOG_INTERVAL_S.
+"""
+
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import redis
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._counts = [0] * len(buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for bound, bucket_count in zip(self.buckets, counts):
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {bucket_count}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+FORWARDED = Counter("monitor_queue_forwarded_total", "Stream entries forwarded to the monitor and acked")
+FORWARD_SECONDS = Histogram("monitor_queue_forward_seconds", "Latency of one HTTP forward to the monitor")
+RETRIES = Counter("monitor_queue_retries_total", "Forwards scheduled for a delayed retry")
+DEAD_LETTERED = Counter("monitor_queue_dead_lettered_total", "Entries dropped to the dead-letter stream")
+RECLAIMED = Counter("monitor_queue_reclaimed_total", "Pending entries claimed from idle or dead consumers")
+
+_METRICS = [FORWARDED, FORWARD_SECONDS, RETRIES, DEAD_LETTERED, RECLAIMED]
+
+
+def register(*extra) -> None:
+    """Add metrics defined in other modules to the /metrics output."""
+    _METRICS.extend(extra)
+
+
+def _stream_gauges(r: redis.Redis, streams: list) -> list:
+    lengths = [
+        "# HELP monitor_queue_stream_length Entries currently stored in the stream",
+        "# TYPE monitor_queue_stream_length gauge",
+    ]
+    pending = [
+        "# HELP monitor_queue_group_pending Entries delivered to the group but not acked (PEL size)",
+        "# TYPE monitor_queue_group_pending gauge",
+    ]
+    lag = [
+        "# HELP monitor_queue_group_lag Entries not yet delivered to the group",
+        "# TYPE monitor_queue_group_lag gauge",
+    ]
+    for stream in streams:
+        lengths.append(f'monitor_queue_stream_length{{stream="{stream}"}} {r.xlen(stream)}')
+        for group in r.xinfo_groups(stream):
+            labels = f'stream="{stream}",group="{group["name"]}"'
+            pending.append(f"monitor_queue_group_pending{{{labels}}} {group['pending']}")
+            # `lag` is reported by Redis >= 7.0 and may be nil when it can't be computed.
+            if group.get("lag") is not None:
+                lag.append(f"monitor_queue_group_lag{{{labels}}} {group['lag']}")
+    return lengths + pending + lag
+
+
+def render(r: redis.Redis | None = None, streams: list | None = None) -> str:
+    lines: list = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    if r is not None and streams:
+        try:
+            lines.extend(_stream_gauges(r, streams))
+        except redis.exceptions.RedisError as exc:
+            lines.append(f"# stream gauges unavailable: {exc}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int, r: redis.Redis | None = None, streams: list | None = None) -> ThreadingHTTPServer:
+    """Serve GET /metrics on `port` from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render(r, streams).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+class SummaryLogger:
+    """Logs forwarded/retry/DLQ deltas and throughput once per interval."""
+
+    def __init__(self, log: logging.Logger, interval_s: float) -> None:
+        self._log = log
+        self._interval = interval_s
+        self._last_at = time.monotonic()
+        self._last = self._snapshot()
+
+    @staticmethod
+    def _snapshot() -> tuple:
+        return FORWARDED.value, RETRIES.value, DEAD_LETTERED.value, RECLAIMED.value
+
+    def maybe_log(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_at
+        if elapsed < self._interval:
+            return
+        current = self._snapshot()
+        forwarded, retries, dead, reclaimed = (c - p for c, p in zip(current, self._last))
+        if any((forwarded, retries, dead, reclaimed)):
+            self._log.info(
+                "forwarded=%d (%.1f/s) retries=%d dead_lettered=%d reclaimed=%d in last %.0fs",
+                forwarded, forwarded / elapsed, retries, dead, reclaimed, elapsed,
+            )
+        self._last, self._last_at = current, now
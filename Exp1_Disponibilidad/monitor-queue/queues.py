@@ -3,93 +3,665 @@ monitor-queue: Redis Stream consumer.
 
 Reads heartbeat payloads published by payments services from the Redis stream
 'reports' and forwards them to the monitor's /api/monitor/heartbeats endpoint.
-Retries with exponential back-off on transient HTTP/network errors.
+Retries with exponential back-off on transient HTTP/network errors; a 4xx
+answer other than 408/429 means the payload itself was refused, so the entry is
+dead-lettered at once instead of being retried.
+
+With BATCH_MODE enabled, each read batch (up to BATCH_SIZE entries, waiting at
+most BATCH_LINGER_MS for it to fill) is forwarded as a single JSON array to the
+monitor's /api/monitor/heartbeats/batch endpoint and acked with one XACK; the
+items the monitor reports as rejected are dead-lettered instead.
+
+Failed forwards never block the read loop: they are parked in an in-process
+retry heap keyed by due time and re-sent when due, while the stream keeps being
+drained. Parked entries stay unacked, so they remain in the group's PEL until
+they succeed or exhaust their retry budget.
+
+Every RECLAIM_INTERVAL_S the consumer scans the PEL for entries idle longer
+than RECLAIM_IDLE_MS (e.g. left behind by a crash) and claims them again.
+Entries it is still working on (parked or in flight) are re-claimed to itself
+with `XCLAIM ... JUSTID` on every liveness heartbeat, which resets their idle
+time, so no other consumer of the group takes them over while a back-off of up
+to RETRY_MAX_DELAY_S runs. CONSUMER_HEARTBEAT_S must stay below
+RECLAIM_IDLE_MS.
+Entries that exhaust their retries, were delivered MAX_DELIVERIES times or
+cannot be parsed are moved to the dead-letter stream DLQ_STREAM together with
+the last error seen. `python queues.py replay-dlq` re-injects them.
+
+CONSUMER_MODE=async switches to the asyncio forwarder in async_forwarder.py,
+which keeps up to MAX_IN_FLIGHT forwards open over a pooled keep-alive client.
+
+Consumer names are generated per process unless CONSUMER_NAME is set, so the
+service can run as N compose replicas and/or spawn WORKERS processes. Each
+consumer refreshes its liveness score in a sorted set; a janitor claims the
+pending entries of consumers that stopped reporting and removes them from the
+group.
+
+metrics.py serves Prometheus metrics on METRICS_PORT (worker N of a WORKERS
+pool uses METRICS_PORT + N); instead of one INFO line per ack, throughput is
+logged once every LOG_INTERVAL_S.
+
+Every TRIM_INTERVAL_S a background trimmer (retention.py) cuts the stream at
+the oldest entry any consumer group still needs; `python queues.py trim` runs
+one pass by hand.
+
+With STREAM_SHARDS=N producers write each service to `{STREAM_NAME}:{k}`, where
+k = crc32(service) % N, so a service always lands on the same shard and keeps
+its order. The consumer reads the shards listed in SHARDS (all by default) with
+one XREADGROUP, and a WORKERS pool splits them between its processes, so shards
+are consumed in parallel. Acks, reclaim, the janitor and trimming work per
+shard; dead-lettered entries record their shard in `source_stream`. Shards
+are not assigned between replicas: an empty SHARDS means "all of them", so with
+more than one replica each one must set its own, disjoint SHARDS list (and
+WORKERS at or below its length). A shard read by two consumers no longer
+guarantees per-service order; on startup the consumer warns when another live
+consumer of the group already reads one of its shards.
 """
 
+import argparse
+import heapq
+import itertools
 import json
 import logging
+import multiprocessing
 import os
+import socket
 import time
-from urllib.error import HTTPError, URLError
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from urllib.error import HTTPError
 from urllib.request import Request, urlopen
+from uuid import uuid4
 
 import redis
 
+import metrics
+import retention
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
 
 REDIS_URL      = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 MONITOR_URL    = os.getenv("MONITOR_URL", "http://localhost:5001/api/monitor/heartbeats")
 STREAM_NAME    = os.getenv("STREAM_NAME", "reports")
+STREAM_SHARDS  = int(os.getenv("STREAM_SHARDS", 0))
+SHARDS         = os.getenv("SHARDS", "")
 CONSUMER_GROUP = os.getenv("CONSUMER_GROUP", "monitor-queue-group")
-CONSUMER_NAME  = os.getenv("CONSUMER_NAME", "worker-1")
+CONSUMER_NAME  = os.getenv("CONSUMER_NAME", "auto")
+CONSUMER_MODE  = os.getenv("CONSUMER_MODE", "sync").lower()
 BLOCK_MS       = int(os.getenv("BLOCK_MS", 5000))
 MAX_RETRIES    = int(os.getenv("MAX_RETRIES", 12))
 
+BATCH_MODE        = os.getenv("BATCH_MODE", "false").lower() in {"1", "true", "yes"}
+MONITOR_BATCH_URL = os.getenv("MONITOR_BATCH_URL", MONITOR_URL.rstrip("/") + "/batch")
+BATCH_SIZE        = int(os.getenv("BATCH_SIZE", 10))
+BATCH_LINGER_MS   = int(os.getenv("BATCH_LINGER_MS", 200))
+
+RETRY_MAX_DELAY_S = float(os.getenv("RETRY_MAX_DELAY_S", 300))
+RETRY_QUEUE_LIMIT = int(os.getenv("RETRY_QUEUE_LIMIT", 1000))
+
+DLQ_STREAM         = os.getenv("DLQ_STREAM", f"{STREAM_NAME}:dlq")
+RECLAIM_INTERVAL_S = float(os.getenv("RECLAIM_INTERVAL_S", 30))
+RECLAIM_IDLE_MS    = int(os.getenv("RECLAIM_IDLE_MS", 60000))
+RECLAIM_COUNT      = int(os.getenv("RECLAIM_COUNT", 100))
+MAX_DELIVERIES     = int(os.getenv("MAX_DELIVERIES", 5))
+ERROR_KEY_TTL_S    = int(os.getenv("ERROR_KEY_TTL_S", 86400))
+
+WORKERS                = int(os.getenv("WORKERS", 1))
+CONSUMERS_KEY          = os.getenv("CONSUMERS_KEY", f"{STREAM_NAME}:{CONSUMER_GROUP}:consumers")
+CONSUMER_HEARTBEAT_S   = float(os.getenv("CONSUMER_HEARTBEAT_S", 10))
+CONSUMER_DEAD_AFTER_S  = float(os.getenv("CONSUMER_DEAD_AFTER_S", 60))
+JANITOR_INTERVAL_S     = float(os.getenv("JANITOR_INTERVAL_S", 30))
+
+METRICS_PORT   = int(os.getenv("METRICS_PORT", 9100))
+LOG_INTERVAL_S = float(os.getenv("LOG_INTERVAL_S", 60))
+
+TRIM_INTERVAL_S = float(os.getenv("TRIM_INTERVAL_S", 60))
+
+
+@dataclass
+class _Delivery:
+    """One forward to the monitor: a single heartbeat or a whole batch."""
+
+    stream: str
+    messages: list
+    body: bytes
+    url: str
+    label: str
+    attempt: int = 0
+
+    @property
+    def ids(self) -> list:
+        return [msg_id for msg_id, _fields in self.messages]
+
+    @property
+    def keys(self) -> list:
+        return [(self.stream, msg_id) for msg_id in self.ids]
+
+
+class RetryScheduler:
+    """Min-heap of failed deliveries ordered by the time they are due again."""
+
+    def __init__(self) -> None:
+        self._heap: list = []
+        self._seq = itertools.count()
+        self.held: set = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, delivery: _Delivery, delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), delivery))
+        self.held.update(delivery.keys)
+
+    def pop_due(self) -> list:
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            delivery = heapq.heappop(self._heap)[2]
+            self.held.difference_update(delivery.keys)
+            due.append(delivery)
+        return due
+
+    def block_ms(self, default_ms: int) -> int:
+        """How long the reader may block without making the next retry late."""
+        if not self._heap:
+            return default_ms
+        remaining = int((self._heap[0][0] - time.monotonic()) * 1000)
+        # XREADGROUP treats BLOCK 0 as "forever", so never go below 1 ms.
+        return max(1, min(default_ms, remaining))
+
+
+def configured_streams() -> list:
+    """The streams this service consumes: STREAM_NAME, or the shards selected by SHARDS.
+
+    An empty SHARDS selects every shard, which is only right for a single replica.
+    """
+    if STREAM_SHARDS <= 0:
+        return [STREAM_NAME]
+    shards = [int(s) for s in SHARDS.split(",") if s.strip()] or range(STREAM_SHARDS)
+    return [f"{STREAM_NAME}:{shard}" for shard in shards]
+
+
+def worker_streams(slot: int, workers: int) -> list:
+    """Shards assigned to worker `slot` of a `workers` pool: round-robin, at least one each."""
+    streams = configured_streams()
+    if workers <= len(streams):
+        return streams[slot::workers]
+    return [streams[slot % len(streams)]]
 
-def _forward(payload_bytes: bytes, retries: int = 0) -> None:
+
+def _backoff(attempt: int) -> float:
+    return min(2 ** attempt, RETRY_MAX_DELAY_S) + (0.1 * attempt)
+
+
+def _permanent_failure(status: int | None) -> bool:
+    """4xx answers other than timeout/throttling won't change on retry."""
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def _error_key(stream: str, msg_id: str) -> str:
+    return f"{stream}:error:{msg_id}"
+
+
+def _remember_error(r: redis.Redis, stream: str, msg_id: str, error: object) -> None:
+    """Keep the last error of an unacked entry so the DLQ can report it later."""
+    try:
+        r.set(_error_key(stream, msg_id), str(error)[:1000], ex=ERROR_KEY_TTL_S)
+    except redis.exceptions.RedisError:
+        pass
+
+
+def _dlq_fields(stream: str, msg_id: str, fields: dict | None, error: object, deliveries: int = 1) -> dict:
+    return {
+        "payload": (fields or {}).get("payload", ""),
+        "source_stream": stream,
+        "source_id": msg_id,
+        "error": str(error)[:1000],
+        "deliveries": deliveries,
+        "failed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _dead_letter(r: redis.Redis, stream: str, messages: list, error: object, deliveries: dict | None = None) -> None:
+    """Move entries of `stream` to DLQ_STREAM with their original payload and ack them atomically."""
+    pipe = r.pipeline()
+    for msg_id, fields in messages:
+        pipe.xadd(DLQ_STREAM, _dlq_fields(stream, msg_id, fields, error, (deliveries or {}).get(msg_id, 1)))
+        pipe.delete(_error_key(stream, msg_id))
+    pipe.xack(stream, CONSUMER_GROUP, *[msg_id for msg_id, _fields in messages])
+    pipe.execute()
+    metrics.DEAD_LETTERED.inc(len(messages))
+    log.error("Dead-lettered %d entries to '%s': %s", len(messages), DLQ_STREAM, error)
+
+
+def _forward(payload_bytes: bytes, url: str = MONITOR_URL) -> bytes:
     req = Request(
-        MONITOR_URL,
+        url,
         data=payload_bytes,
         headers={"Content-Type": "application/json"},
         method="POST",
     )
+    with urlopen(req, timeout=10) as resp:
+        return resp.read()
+
+
+def _deliver(r: redis.Redis, retries: RetryScheduler, delivery: _Delivery) -> None:
+    """Send one delivery; ack on success, park it in the retry heap on failure."""
+    started = time.perf_counter()
     try:
-        with urlopen(req, timeout=10) as resp:
-            resp.read()
-    except (HTTPError, URLError) as exc:
-        if retries >= MAX_RETRIES:
-            log.error("Max retries reached, dropping message: %s", exc)
+        body = _forward(delivery.body, delivery.url)
+    except OSError as exc:  # URLError, HTTPError and socket timeouts
+        metrics.FORWARD_SECONDS.observe(time.perf_counter() - started)
+        if isinstance(exc, HTTPError) and _permanent_failure(exc.code):
+            _dead_letter(r, delivery.stream, delivery.messages, f"rejected by monitor: {exc}")
+            return
+        if delivery.attempt >= MAX_RETRIES:
+            log.error("Max retries reached for %s", delivery.label)
+            _dead_letter(r, delivery.stream, delivery.messages, exc)
             return
-        wait = min(2 ** retries, 300) + (0.1 * retries)
-        log.warning("Forward failed (%s), retry %d in %.1fs", exc, retries + 1, wait)
-        time.sleep(wait)
-        _forward(payload_bytes, retries + 1)
+        wait = _backoff(delivery.attempt)
+        delivery.attempt += 1
+        retries.schedule(delivery, wait)
+        metrics.RETRIES.inc()
+        log.debug("Forward of %s failed (%s), retry %d in %.1fs", delivery.label, exc, delivery.attempt, wait)
+        return
+
+    metrics.FORWARD_SECONDS.observe(time.perf_counter() - started)
+    rejected: dict = {}
+    if delivery.url == MONITOR_BATCH_URL:
+        summary = json.loads(body) if body else {}
+        # Each error's index points into the batch, i.e. into delivery.messages.
+        for error in summary.get("errors") or []:
+            rejected[error["index"]] = error.get("error", "rejected by monitor")
+    for index, error in rejected.items():
+        _dead_letter(r, delivery.stream, [delivery.messages[index]], f"rejected by monitor: {error}")
+    accepted = [msg_id for index, msg_id in enumerate(delivery.ids) if index not in rejected]
+    if accepted:
+        r.xack(delivery.stream, CONSUMER_GROUP, *accepted)
+    metrics.FORWARDED.inc(len(accepted))
+    log.debug("ACK %s", delivery.label)
+
+
+def _fire_due_retries(r: redis.Redis, retries: RetryScheduler) -> None:
+    for delivery in retries.pop_due():
+        try:
+            _deliver(r, retries, delivery)
+        except Exception as exc:
+            log.error("Failed to retry %s: %s", delivery.label, exc)
+
+
+def _ensure_groups(r: redis.Redis, streams: list) -> None:
+    for stream in streams:
+        try:
+            r.xgroup_create(stream, CONSUMER_GROUP, id="0", mkstream=True)
+            log.info("Created consumer group '%s' on stream '%s'", CONSUMER_GROUP, stream)
+        except redis.exceptions.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+
+def _warn_shared_streams(r: redis.Redis, consumer: str, streams: list) -> None:
+    """Log the streams that another live consumer of the group is already reading."""
+    alive = set(r.zrangebyscore(CONSUMERS_KEY, time.time() - CONSUMER_DEAD_AFTER_S, "+inf"))
+    for stream in streams:
+        try:
+            others = [
+                info["name"] for info in r.xinfo_consumers(stream, CONSUMER_GROUP)
+                if info["name"] != consumer
+                and (info["name"] in alive or info["idle"] < CONSUMER_DEAD_AFTER_S * 1000)
+            ]
+        except redis.exceptions.RedisError:
+            continue
+        if others:
+            log.warning(
+                "'%s' is also read by %s: per-service order is not guaranteed; "
+                "give each replica a disjoint SHARDS list",
+                stream, ", ".join(others),
+            )
+
 
+def _consumer_name() -> str:
+    """CONSUMER_NAME, or a name unique to this host and process when it is 'auto'."""
+    if CONSUMER_NAME and CONSUMER_NAME != "auto":
+        return CONSUMER_NAME
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
 
-def _ensure_group(r: redis.Redis) -> None:
+
+def _read(r: redis.Redis, consumer: str, streams: list, count: int, block_ms: int) -> list:
     try:
-        r.xgroup_create(STREAM_NAME, CONSUMER_GROUP, id="0", mkstream=True)
-        log.info("Created consumer group '%s' on stream '%s'", CONSUMER_GROUP, STREAM_NAME)
-    except redis.exceptions.ResponseError as exc:
-        if "BUSYGROUP" not in str(exc):
-            raise
+        return r.xreadgroup(
+            CONSUMER_GROUP,
+            consumer,
+            {stream: ">" for stream in streams},
+            count=count,
+            block=block_ms,
+        )
+    except redis.exceptions.ConnectionError as exc:
+        log.error("Redis connection error: %s — retrying in 5s", exc)
+        time.sleep(5)
+        return []
 
 
-def run() -> None:
-    r = redis.from_url(REDIS_URL, decode_responses=True)
-    _ensure_group(r)
-    log.info("Listening on stream '%s' as '%s/%s' → %s", STREAM_NAME, CONSUMER_GROUP, CONSUMER_NAME, MONITOR_URL)
+def _collect_batch(r: redis.Redis, consumer: str, streams: list, block_ms: int) -> dict:
+    """Block for the first entries, then linger up to BATCH_LINGER_MS to fill the batch.
+
+    Returns the entries grouped by the stream they were read from.
+    """
+    batch: dict = {}
+    size = 0
+    deadline = None
+    while size < BATCH_SIZE:
+        if deadline is not None:
+            block_ms = int((deadline - time.monotonic()) * 1000)
+            if block_ms <= 0:
+                break
+        results = _read(r, consumer, streams, BATCH_SIZE - size, block_ms)
+        if not results:
+            break
+        for stream, messages in results:
+            batch.setdefault(stream, []).extend(messages)
+            size += len(messages)
+        if deadline is None:
+            deadline = time.monotonic() + BATCH_LINGER_MS / 1000
+    return batch
+
+
+def _flush_batch(r: redis.Redis, retries: RetryScheduler, stream: str, messages: list) -> None:
+    valid = []
+    payloads = []
+    for msg_id, fields in messages:
+        try:
+            payloads.append(json.loads(fields.get("payload", "{}")))
+            valid.append((msg_id, fields))
+        except ValueError as exc:
+            _dead_letter(r, stream, [(msg_id, fields)], f"malformed payload: {exc}")
+
+    if not valid:
+        return
+    label = f"batch of {len(valid)}  {stream} {valid[0][0]}..{valid[-1][0]}"
+    try:
+        body = json.dumps(payloads).encode("utf-8")
+        _deliver(r, retries, _Delivery(stream=stream, messages=valid, body=body, url=MONITOR_BATCH_URL, label=label))
+    except Exception as exc:
+        log.error("Failed to process %s: %s", label, exc)
+        for msg_id, _fields in valid:
+            _remember_error(r, stream, msg_id, exc)
+
+
+def _process_message(r: redis.Redis, retries: RetryScheduler, stream: str, msg_id: str, fields: dict) -> None:
+    raw = fields.get("payload", "{}")
+    try:
+        payload_obj = json.loads(raw)
+    except ValueError as exc:
+        _dead_letter(r, stream, [(msg_id, fields)], f"malformed payload: {exc}")
+        return
+    try:
+        payload_bytes = json.dumps(payload_obj).encode("utf-8")
+        label = f"{stream} {msg_id}  service={payload_obj.get('service')}  status={payload_obj.get('status')}"
+        _deliver(r, retries, _Delivery(
+            stream=stream, messages=[(msg_id, fields)], body=payload_bytes, url=MONITOR_URL, label=label
+        ))
+    except Exception as exc:
+        log.error("Failed to process message %s: %s", msg_id, exc)
+        _remember_error(r, stream, msg_id, exc)
+
+
+def _claim_stale(r: redis.Redis, stream: str, consumer: str, held: set) -> list:
+    """Claim PEL entries of `stream` idle longer than RECLAIM_IDLE_MS and return the ones worth retrying.
 
+    Entries parked in our own retry heap (`held` holds `(stream, id)` pairs) are
+    skipped. Entries already delivered MAX_DELIVERIES times are dead-lettered
+    with the last error recorded for them.
+    """
+    claimed: list = []
+    start = "-"
     while True:
+        pending = r.xpending_range(
+            stream, CONSUMER_GROUP, min=start, max="+", count=RECLAIM_COUNT, idle=RECLAIM_IDLE_MS
+        )
+        if not pending:
+            break
+        start = "(" + pending[-1]["message_id"]
+
+        deliveries = {
+            p["message_id"]: p["times_delivered"] for p in pending if (stream, p["message_id"]) not in held
+        }
+        if deliveries:
+            # XCLAIM re-checks the idle time, so a concurrent consumer can't steal it twice.
+            # Entries trimmed from the stream meanwhile are dropped from the PEL by Redis.
+            messages = r.xclaim(stream, CONSUMER_GROUP, consumer, RECLAIM_IDLE_MS, list(deliveries))
+            messages = [(msg_id, fields) for msg_id, fields in messages if msg_id and fields]
+            exhausted = [(msg_id, fields) for msg_id, fields in messages if deliveries[msg_id] >= MAX_DELIVERIES]
+            for msg_id, fields in exhausted:
+                last_error = r.get(_error_key(stream, msg_id)) or "unknown (consumer died or never acked)"
+                _dead_letter(r, stream, [(msg_id, fields)], last_error, deliveries)
+            claimed.extend(
+                (msg_id, fields) for msg_id, fields in messages if deliveries[msg_id] < MAX_DELIVERIES
+            )
+
+        if len(pending) < RECLAIM_COUNT:
+            break
+    metrics.RECLAIMED.inc(len(claimed))
+    return claimed
+
+
+def _touch_consumer(r: redis.Redis, consumer: str) -> None:
+    """Liveness heartbeat: record when this consumer was last seen alive."""
+    try:
+        r.zadd(CONSUMERS_KEY, {consumer: time.time()})
+    except redis.exceptions.RedisError as exc:
+        log.error("Consumer heartbeat failed: %s", exc)
+
+
+def _keep_held(r: redis.Redis, consumer: str, held: set) -> None:
+    """Reset the PEL idle time of the `(stream, id)` entries this consumer still owns."""
+    by_stream: dict = {}
+    for stream, msg_id in held:
+        by_stream.setdefault(stream, []).append(msg_id)
+    for stream, ids in by_stream.items():
         try:
-            results = r.xreadgroup(
-                CONSUMER_GROUP,
-                CONSUMER_NAME,
-                {STREAM_NAME: ">"},
-                count=10,
-                block=BLOCK_MS,
+            # JUSTID leaves the delivery counter alone, so MAX_DELIVERIES is unaffected.
+            r.xclaim(stream, CONSUMER_GROUP, consumer, 0, ids, justid=True)
+        except redis.exceptions.RedisError as exc:
+            log.error("Refreshing %d held entries of '%s' failed: %s", len(ids), stream, exc)
+
+
+def _reap_dead_consumers(r: redis.Redis, stream: str, consumer: str) -> list:
+    """Claim the `stream` PEL of consumers that stopped heartbeating, then delete them from the group.
+
+    A consumer without a recent liveness score is only considered dead once the
+    group has also seen it idle for CONSUMER_DEAD_AFTER_S, which protects
+    consumers started with an older build that never heartbeats. It is deleted
+    only after its PEL is empty, since XGROUP DELCONSUMER drops pending entries.
+    """
+    cutoff = time.time() - CONSUMER_DEAD_AFTER_S
+    alive = set(r.zrangebyscore(CONSUMERS_KEY, cutoff, "+inf"))
+    claimed: list = []
+    for info in r.xinfo_consumers(stream, CONSUMER_GROUP):
+        name = info["name"]
+        if name == consumer or name in alive or info["idle"] < CONSUMER_DEAD_AFTER_S * 1000:
+            continue
+        while True:
+            pending = r.xpending_range(
+                stream, CONSUMER_GROUP, min="-", max="+", count=RECLAIM_COUNT, consumername=name
             )
-        except redis.exceptions.ConnectionError as exc:
-            log.error("Redis connection error: %s — retrying in 5s", exc)
-            time.sleep(5)
+            if not pending:
+                break
+            # A 1 s min-idle makes concurrent janitors race safely: only the first XCLAIM wins.
+            messages = r.xclaim(stream, CONSUMER_GROUP, consumer, 1000, [p["message_id"] for p in pending])
+            claimed.extend((msg_id, fields) for msg_id, fields in messages if msg_id and fields)
+            if len(pending) < RECLAIM_COUNT:
+                break
+        if not r.xpending_range(stream, CONSUMER_GROUP, min="-", max="+", count=1, consumername=name):
+            r.xgroup_delconsumer(stream, CONSUMER_GROUP, name)
+            r.zrem(CONSUMERS_KEY, name)
+            log.warning("Removed dead consumer '%s' from group '%s' on '%s'", name, CONSUMER_GROUP, stream)
+    r.zremrangebyscore(CONSUMERS_KEY, "-inf", cutoff - 10 * CONSUMER_DEAD_AFTER_S)
+    metrics.RECLAIMED.inc(len(claimed))
+    return claimed
+
+
+def _process_claimed(r: redis.Redis, retries: RetryScheduler, stream: str, messages: list) -> None:
+    if BATCH_MODE:
+        for start in range(0, len(messages), BATCH_SIZE):
+            _flush_batch(r, retries, stream, messages[start:start + BATCH_SIZE])
+    else:
+        for msg_id, fields in messages:
+            _process_message(r, retries, stream, msg_id, fields)
+
+
+def _reclaim(r: redis.Redis, consumer: str, streams: list, retries: RetryScheduler) -> None:
+    for stream in streams:
+        try:
+            messages = _claim_stale(r, stream, consumer, retries.held)
+        except redis.exceptions.RedisError as exc:
+            log.error("Reclaim pass on '%s' failed: %s", stream, exc)
             continue
+        if messages:
+            log.warning("Reclaimed %d stale pending entries from '%s'", len(messages), stream)
+            _process_claimed(r, retries, stream, messages)
 
-        if not results:
+
+def _janitor(r: redis.Redis, consumer: str, streams: list, retries: RetryScheduler) -> None:
+    for stream in streams:
+        try:
+            messages = _reap_dead_consumers(r, stream, consumer)
+        except redis.exceptions.RedisError as exc:
+            log.error("Janitor pass on '%s' failed: %s", stream, exc)
+            continue
+        if messages:
+            log.warning("Took over %d pending entries of '%s' from dead consumers", len(messages), stream)
+            _process_claimed(r, retries, stream, messages)
+
+
+def run(consumer: str | None = None, streams: list | None = None) -> None:
+    consumer = consumer or _consumer_name()
+    streams = streams or configured_streams()
+    r = redis.from_url(REDIS_URL, decode_responses=True)
+    _ensure_groups(r, streams)
+    _warn_shared_streams(r, consumer, streams)
+    log.info(
+        "Listening on %s as '%s/%s' → %s",
+        ", ".join(f"'{s}'" for s in streams), CONSUMER_GROUP, consumer, MONITOR_BATCH_URL if BATCH_MODE else MONITOR_URL,
+    )
+
+    retries = RetryScheduler()
+    summary = metrics.SummaryLogger(log, LOG_INTERVAL_S)
+    next_reclaim = next_heartbeat = next_janitor = time.monotonic()
+    while True:
+        _fire_due_retries(r, retries)
+        summary.maybe_log()
+
+        now = time.monotonic()
+        if now >= next_heartbeat:
+            _touch_consumer(r, consumer)
+            _keep_held(r, consumer, retries.held)
+            next_heartbeat = now + CONSUMER_HEARTBEAT_S
+        if now >= next_reclaim:
+            _reclaim(r, consumer, streams, retries)
+            next_reclaim = time.monotonic() + RECLAIM_INTERVAL_S
+        if now >= next_janitor:
+            _janitor(r, consumer, streams, retries)
+            next_janitor = time.monotonic() + JANITOR_INTERVAL_S
+
+        if len(retries) >= RETRY_QUEUE_LIMIT:
+            # The monitor is failing for everything we send; stop pulling new
+            # entries until parked retries drain instead of growing the heap.
+            time.sleep(retries.block_ms(BLOCK_MS) / 1000)
+            continue
+
+        # Never block past the next liveness heartbeat.
+        block_ms = retries.block_ms(min(BLOCK_MS, int(CONSUMER_HEARTBEAT_S * 1000)))
+        if BATCH_MODE:
+            batch = _collect_batch(r, consumer, streams, block_ms)
+            for stream, messages in batch.items():
+                _flush_batch(r, retries, stream, messages)
             continue
 
-        for _stream, messages in results:
+        results = _read(r, consumer, streams, 10, block_ms)
+        for stream, messages in results or []:
             for msg_id, fields in messages:
-                raw = fields.get("payload", "{}")
-                try:
-                    payload_obj = json.loads(raw)
-                    payload_bytes = json.dumps(payload_obj).encode("utf-8")
-                    _forward(payload_bytes)
-                    r.xack(STREAM_NAME, CONSUMER_GROUP, msg_id)
-                    log.info("ACK %s  service=%s  status=%s", msg_id, payload_obj.get("service"), payload_obj.get("status"))
-                except Exception as exc:
-                    log.error("Failed to process message %s: %s", msg_id, exc)
+                _process_message(r, retries, stream, msg_id, fields)
+
+
+def _run_worker(slot: int = 0, workers: int = 1) -> None:
+    consumer = _consumer_name()
+    streams = worker_streams(slot, workers)
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT + slot, redis.from_url(REDIS_URL, decode_responses=True), streams)
+    if TRIM_INTERVAL_S > 0 and slot == 0:
+        retention.start_trimmer(redis.from_url(REDIS_URL, decode_responses=True), configured_streams(), TRIM_INTERVAL_S)
+    if CONSUMER_MODE == "async":
+        import asyncio
+
+        from async_forwarder import run_async
+
+        asyncio.run(run_async(consumer, streams))
+    else:
+        run(consumer, streams)
+
+
+def _supervise(workers: int) -> None:
+    """Run `workers` consumer processes, each with its own generated name and shard set, restarting dead ones."""
+    if CONSUMER_NAME != "auto":
+        raise SystemExit("WORKERS > 1 requires CONSUMER_NAME=auto so each worker gets a unique name")
+    procs: dict = {}
+    while True:
+        for slot in range(workers):
+            proc = procs.get(slot)
+            if proc is not None and proc.is_alive():
+                continue
+            if proc is not None:
+                log.error("Worker %d exited with code %s, restarting", slot, proc.exitcode)
+            proc = multiprocessing.Process(
+                target=_run_worker, args=(slot, workers), name=f"worker-{slot}", daemon=True
+            )
+            proc.start()
+            procs[slot] = proc
+        time.sleep(1)
+
+
+def replay_dlq(limit: int | None = None, chunk: int = 500) -> int:
+    """Re-inject dead-lettered entries into their source stream, in pipelined chunks."""
+    r = redis.from_url(REDIS_URL, decode_responses=True)
+    replayed = 0
+    while limit is None or replayed < limit:
+        count = chunk if limit is None else min(chunk, limit - replayed)
+        entries = r.xrange(DLQ_STREAM, min="-", max="+", count=count)
+        if not entries:
+            break
+        pipe = r.pipeline()
+        for _dlq_id, fields in entries:
+            pipe.xadd(fields.get("source_stream") or STREAM_NAME, {"payload": fields.get("payload", "")})
+        pipe.xdel(DLQ_STREAM, *[dlq_id for dlq_id, _fields in entries])
+        pipe.execute()
+        replayed += len(entries)
+    log.info("Replayed %d entries from '%s'", replayed, DLQ_STREAM)
+    return replayed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis stream → monitor forwarder")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="consume the stream (default)")
+    replay = commands.add_parser("replay-dlq", help=f"re-inject entries from {DLQ_STREAM}")
+    replay.add_argument("--limit", type=int, default=None, help="maximum entries to replay (default: all)")
+    replay.add_argument("--chunk", type=int, default=500, help="entries per XRANGE/pipeline round trip")
+    commands.add_parser("trim", help="trim the consumed streams below the oldest entry still needed by a group")
+    args = parser.parse_args()
+
+    if args.command == "replay-dlq":
+        replay_dlq(args.limit, args.chunk)
+    elif args.command == "trim":
+        r = redis.from_url(REDIS_URL, decode_responses=True)
+        for stream in configured_streams():
+            log.info("Trim result: %s", retention.trim_once(r, stream))
+    elif WORKERS > 1:
+        _supervise(WORKERS)
+    else:
+        _run_worker()
 
 
 if __name__ == "__main__":
-    run()
+    main()
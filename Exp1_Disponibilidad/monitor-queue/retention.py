@@ -0,0 +1,89 @@
+"""
+Stream retention for monitor-queue.
+
+Producers cap the stream with an approximate MAXLEN; this trimmer additionally
+removes everything that every consumer group is done with. The safe cut-off is
+the oldest entry still pending (unacked) in any group, or the group's
+last-delivered-id when its PEL is empty: entries older than that have been
+delivered and acked by all groups. It trims with `XTRIM MINID ~` so Redis only
+drops whole macro-nodes, and reports how many entries and bytes were reclaimed.
+Bytes are an estimate: the removed entries times the average entry size, from
+one `MEMORY USAGE` with Redis' default sampling (`SAMPLES 0` would walk the
+whole stream on every pass).
+"""
+
+import logging
+import threading
+import time
+
+import redis
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+TRIMMED_ENTRIES = metrics.Counter("monitor_queue_trimmed_entries_total", "Entries removed by the retention trimmer")
+TRIMMED_BYTES = metrics.Counter("monitor_queue_trimmed_bytes_total", "Estimated stream memory reclaimed by the retention trimmer")
+metrics.register(TRIMMED_ENTRIES, TRIMMED_BYTES)
+
+
+def _id_key(entry_id: str) -> tuple:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def safe_min_id(r: redis.Redis, stream: str) -> str | None:
+    """Oldest entry id some consumer group may still need, or None if there are no groups."""
+    floor = []
+    for group in r.xinfo_groups(stream):
+        summary = r.xpending(stream, group["name"])
+        if summary["pending"]:
+            floor.append(summary["min"])
+        else:
+            floor.append(group["last-delivered-id"])
+    # Without groups nobody has consumed anything yet, so nothing is known to be safe.
+    return min(floor, key=_id_key) if floor else None
+
+
+def trim_once(r: redis.Redis, stream: str) -> dict:
+    min_id = safe_min_id(r, stream)
+    if min_id is None or min_id == "0-0":
+        return {"stream": stream, "min_id": min_id, "entries": 0, "bytes": 0}
+
+    length_before = r.xlen(stream)
+    bytes_before = r.memory_usage(stream) or 0
+    r.xtrim(stream, minid=min_id, approximate=True)
+    entries = max(0, length_before - r.xlen(stream))
+    reclaimed = bytes_before * entries // length_before if entries else 0
+
+    result = {
+        "stream": stream,
+        "min_id": min_id,
+        "entries": entries,
+        "bytes": reclaimed,
+    }
+    TRIMMED_ENTRIES.inc(result["entries"])
+    TRIMMED_BYTES.inc(result["bytes"])
+    if result["entries"]:
+        log.info(
+            "Trimmed %d entries (~%d bytes) from '%s' below %s",
+            result["entries"], result["bytes"], stream, min_id,
+        )
+    return result
+
+
+def start_trimmer(r: redis.Redis, streams: list, interval_s: float) -> threading.Thread:
+    """Run `trim_once` on each of `streams` every `interval_s` seconds in a daemon thread."""
+
+    def loop() -> None:
+        while True:
+            for stream in streams:
+                try:
+                    trim_once(r, stream)
+                except redis.exceptions.RedisError as exc:
+                    log.error("Trim of '%s' failed: %s", stream, exc)
+            time.sleep(interval_s)
+
+    thread = threading.Thread(target=loop, name="stream-trimmer", daemon=True)
+    thread.start()
+    return thread
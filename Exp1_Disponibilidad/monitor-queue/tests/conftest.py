@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest
+
+# The service runs its modules as top-level imports (python queues.py).
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import queues  # noqa: E402
+
+
+@pytest.fixture
+def r():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    queues._ensure_groups(r, ["reports"])
+    return r
+
+
+def read(r, consumer: str = "me", count: int = 10) -> list:
+    """Deliver the new entries of ``reports`` to ``consumer`` and return them."""
+    results = r.xreadgroup(queues.CONSUMER_GROUP, consumer, {"reports": ">"}, count=count)
+    return results[0][1] if results else []
+
+
+def pending(r) -> list:
+    return r.xpending_range("reports", queues.CONSUMER_GROUP, min="-", max="+", count=100)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import time
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+import queues
+from conftest import pending, read
+
+
+def _delivery(messages: list, url: str = queues.MONITOR_URL) -> queues._Delivery:
+    return queues._Delivery(
+        stream="reports", messages=messages, body=b"{}", url=url, label="test"
+    )
+
+
+def _fail_with(exc: Exception):
+    def forward(_body: bytes, _url: str) -> bytes:
+        raise exc
+
+    return forward
+
+
+def _http_error(status: int) -> HTTPError:
+    return HTTPError(queues.MONITOR_URL, status, "error", None, None)
+
+
+def test_retry_scheduler_pops_only_due_deliveries() -> None:
+    retries = queues.RetryScheduler()
+    soon = _delivery([("1-0", {})])
+    later = _delivery([("2-0", {})])
+    retries.schedule(soon, 0)
+    retries.schedule(later, 60)
+
+    assert retries.held == {("reports", "1-0"), ("reports", "2-0")}
+    assert retries.pop_due() == [soon]
+    assert retries.held == {("reports", "2-0")}
+    assert len(retries) == 1
+    assert 1 <= retries.block_ms(5000) <= 5000
+
+
+def test_retry_scheduler_never_blocks_zero_ms() -> None:
+    retries = queues.RetryScheduler()
+    retries.schedule(_delivery([("1-0", {})]), 0)
+    time.sleep(0.01)
+
+    assert retries.block_ms(5000) == 1
+    assert queues.RetryScheduler().block_ms(5000) == 5000
+
+
+def test_transient_failure_parks_the_delivery_unacked(r, monkeypatch) -> None:
+    r.xadd("reports", {"payload": "{}"})
+    messages = read(r)
+    monkeypatch.setattr(queues, "_forward", _fail_with(URLError("connection refused")))
+    retries = queues.RetryScheduler()
+
+    queues._deliver(r, retries, _delivery(messages))
+
+    assert len(retries) == 1
+    assert retries.held == {("reports", messages[0][0])}
+    assert len(pending(r)) == 1
+    assert r.xlen(queues.DLQ_STREAM) == 0
+
+
+def test_exhausted_retries_go_to_the_dlq(r, monkeypatch) -> None:
+    r.xadd("reports", {"payload": "{}"})
+    messages = read(r)
+    monkeypatch.setattr(queues, "_forward", _fail_with(URLError("connection refused")))
+    delivery = _delivery(messages)
+    delivery.attempt = queues.MAX_RETRIES
+
+    queues._deliver(r, queues.RetryScheduler(), delivery)
+
+    assert pending(r) == []
+    assert r.xrange(queues.DLQ_STREAM)[0][1]["source_id"] == messages[0][0]
+
+
+@pytest.mark.parametrize("status, dead_lettered", [(400, True), (422, True), (408, False), (429, False), (503, False)])
+def test_only_permanent_http_errors_skip_the_retries(r, monkeypatch, status, dead_lettered) -> None:
+    r.xadd("reports", {"payload": "{}"})
+    monkeypatch.setattr(queues, "_forward", _fail_with(_http_error(status)))
+    retries = queues.RetryScheduler()
+
+    queues._deliver(r, retries, _delivery(read(r)))
+
+    assert r.xlen(queues.DLQ_STREAM) == int(dead_lettered)
+    assert len(retries) == int(not dead_lettered)
+
+
+def test_batch_rejections_are_dead_lettered_and_the_rest_acked(r, monkeypatch) -> None:
+    for i in range(3):
+        r.xadd("reports", {"payload": json.dumps({"i": i})})
+    messages = read(r)
+    summary = {"accepted": 2, "rejected": 1, "errors": [{"index": 1, "error": "invalid status"}]}
+    monkeypatch.setattr(queues, "_forward", lambda _body, _url: json.dumps(summary).encode())
+
+    queues._deliver(r, queues.RetryScheduler(), _delivery(messages, queues.MONITOR_BATCH_URL))
+
+    assert pending(r) == []
+    dead = [fields for _id, fields in r.xrange(queues.DLQ_STREAM)]
+    assert [fields["source_id"] for fields in dead] == [messages[1][0]]
+    assert dead[0]["payload"] == json.dumps({"i": 1})
+    assert "invalid status" in dead[0]["error"]
+
+
+def test_malformed_payload_is_dead_lettered_without_forwarding(r, monkeypatch) -> None:
+    r.xadd("reports", {"payload": "{not json"})
+    (msg_id, fields), = read(r)
+    monkeypatch.setattr(queues, "_forward", _fail_with(AssertionError("must not forward")))
+
+    queues._process_message(r, queues.RetryScheduler(), "reports", msg_id, fields)
+
+    assert pending(r) == []
+    assert r.xrange(queues.DLQ_STREAM)[0][1]["error"].startswith("malformed payload")
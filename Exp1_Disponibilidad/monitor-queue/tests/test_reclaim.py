@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+import queues
+from conftest import pending, read
+
+
+@pytest.fixture(autouse=True)
+def no_idle_threshold(monkeypatch):
+    monkeypatch.setattr(queues, "RECLAIM_IDLE_MS", 0)
+
+
+def _idle() -> None:
+    # Let the PEL entries accumulate some idle time before XPENDING IDLE / XCLAIM.
+    time.sleep(0.01)
+
+
+def test_stale_entries_of_another_consumer_are_claimed(r) -> None:
+    r.xadd("reports", {"payload": "{}"})
+    (msg_id, _fields), = read(r, consumer="crashed")
+    _idle()
+
+    claimed = queues._claim_stale(r, "reports", "me", set())
+
+    assert [entry_id for entry_id, _fields in claimed] == [msg_id]
+    assert pending(r)[0]["consumer"] == "me"
+
+
+def test_entries_parked_by_this_consumer_are_not_claimed(r) -> None:
+    r.xadd("reports", {"payload": "{}"})
+    (msg_id, _fields), = read(r)
+    _idle()
+
+    assert queues._claim_stale(r, "reports", "me", {("reports", msg_id)}) == []
+    assert pending(r)[0]["times_delivered"] == 1
+
+
+def test_entries_delivered_max_times_go_to_the_dlq_with_the_last_error(r, monkeypatch) -> None:
+    monkeypatch.setattr(queues, "MAX_DELIVERIES", 2)
+    r.xadd("reports", {"payload": "{}"})
+    (msg_id, _fields), = read(r, consumer="crashed")
+    queues._remember_error(r, "reports", msg_id, "HTTP Error 503")
+    _idle()
+    queues._claim_stale(r, "reports", "other", set())  # second delivery
+    _idle()
+
+    claimed = queues._claim_stale(r, "reports", "me", set())
+
+    assert claimed == []
+    assert pending(r) == []
+    dead = r.xrange(queues.DLQ_STREAM)[0][1]
+    assert (dead["source_id"], dead["error"], dead["deliveries"]) == (msg_id, "HTTP Error 503", "2")
+    assert r.get(queues._error_key("reports", msg_id)) is None
+
+
+def test_keep_held_resets_idle_time_without_counting_a_delivery(r) -> None:
+    r.xadd("reports", {"payload": "{}"})
+    (msg_id, _fields), = read(r)
+    _idle()
+    assert pending(r)[0]["time_since_delivered"] > 0
+
+    queues._keep_held(r, "me", {("reports", msg_id)})
+
+    entry = pending(r)[0]
+    assert entry["time_since_delivered"] < 10
+    assert entry["times_delivered"] == 1
+    assert entry["consumer"] == "me"
+
+
+def test_parked_entry_survives_other_consumers_reclaim_after_keep_held(r, monkeypatch) -> None:
+    monkeypatch.setattr(queues, "RECLAIM_IDLE_MS", 50)
+    r.xadd("reports", {"payload": "{}"})
+    (msg_id, _fields), = read(r)
+    time.sleep(0.06)
+
+    queues._keep_held(r, "me", {("reports", msg_id)})
+
+    assert queues._claim_stale(r, "reports", "other", set()) == []
+    assert pending(r)[0]["consumer"] == "me"
@@ -3,8 +3,13 @@
 from flask import Flask
 
 from config import config_by_name
+from sql_metrics import SQLMetrics
 from monitor.modelos.modelos import db
 from monitor import monitor_bp
+from monitor.gap_detector import GapDetector
+from monitor.window_cache import WindowCache
+
+sql_metrics = SQLMetrics()
 
 
 def create_app(config_name: str = "default") -> Flask:
@@ -13,6 +18,18 @@ def create_app(config_name: str = "default") -> Flask:
     app.config.from_object(config_class)
 
     db.init_app(app)
+    with app.app_context():
+        sql_metrics.instrument_engine(db.engine)
+    sql_metrics.init_app(app)
+    app.extensions["window_cache"] = WindowCache(
+        app.config["WINDOW_CACHE_SIZE"], app.config["WINDOW_CACHE_GRACE_SECONDS"]
+    )
+    app.extensions["gap_detector"] = GapDetector(
+        app.config["HEARTBEAT_INTERVAL_SECONDS"],
+        app.config["GAP_GRACE_SECONDS"],
+        event_time=app.config["SWEEP_CLOCK"] == "heartbeat",
+        max_lag_seconds=app.config["SWEEP_WATERMARK_MAX_LAG_SECONDS"],
+    ).start()
 
     if app.config.get("CREATE_SCHEMA_ON_STARTUP"):
         with app.app_context():
@@ -20,4 +37,24 @@ def create_app(config_name: str = "default") -> Flask:
 
     app.register_blueprint(monitor_bp, url_prefix="/api/monitor")
 
+    if app.config.get("WRITE_BEHIND_ENABLED"):
+        from monitor.write_behind import WriteBehindBuffer
+
+        app.extensions["write_behind"] = WriteBehindBuffer(
+            app,
+            app.config["WRITE_BEHIND_BUFFER_SIZE"],
+            app.config["WRITE_BEHIND_FLUSH_MS"],
+            app.config["WRITE_BEHIND_FLUSH_RECORDS"],
+        ).start()
+
+    if app.config.get("STREAM_INGESTION_ENABLED"):
+        from monitor.stream_ingestion import start_stream_ingestion
+
+        start_stream_ingestion(app)
+
+    if app.config.get("SWEEPER_ENABLED"):
+        from monitor.sweeper import start_sweeper
+
+        start_sweeper(app)
+
     return app
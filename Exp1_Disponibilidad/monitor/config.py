@@ -20,10 +20,71 @@ class Config:
         os.getenv("WINDOW_DURATION_SECONDS", 300)
     )
 
+    SWEEP_CHUNK_SIZE: int = int(os.getenv("SWEEP_CHUNK_SIZE", 500))
+    SWEEP_INTERVAL_SECONDS: int = int(os.getenv("SWEEP_INTERVAL_SECONDS", 10))
+    SWEEPER_LOCK_NAME: str = os.getenv("SWEEPER_LOCK_NAME", "monitor-window-sweeper")
+
+    # heartbeat_events retention (chunked deletes of long-closed windows)
+    HEARTBEAT_RETENTION_HOURS: int = int(os.getenv("HEARTBEAT_RETENTION_HOURS", 168))
+    RETENTION_CHUNK_SIZE: int = int(os.getenv("RETENTION_CHUNK_SIZE", 1000))
+    RETENTION_PAUSE_MS: int = int(os.getenv("RETENTION_PAUSE_MS", 50))
+    RETENTION_INTERVAL_SECONDS: int = int(os.getenv("RETENTION_INTERVAL_SECONDS", 3600))
+    # Chunks per pass; an unfinished purge resumes on the next sweeper tick (0 = no cap)
+    RETENTION_MAX_CHUNKS: int = int(os.getenv("RETENTION_MAX_CHUNKS", 20))
+
+    # Clock used to decide that a window expired or a tick is overdue:
+    # "wall" is this process' clock; "heartbeat" is each service's latest
+    # ingested report_timestamp, for simulated traffic (payments with
+    # SIMULATION_SPEED != 1) whose timestamps lag real time. A service silent
+    # for SWEEP_WATERMARK_MAX_LAG_SECONDS falls back to the wall clock.
+    SWEEP_CLOCK: str = os.getenv("SWEEP_CLOCK", "wall").lower()
+    SWEEP_WATERMARK_MAX_LAG_SECONDS: int = int(
+        os.getenv("SWEEP_WATERMARK_MAX_LAG_SECONDS", 30)
+    )
+
+    # Early gap detection: flag OPEN windows whose next tick is overdue
+    GAP_GRACE_SECONDS: int = int(os.getenv("GAP_GRACE_SECONDS", 5))
+
+    # In-process cache of window identities used by heartbeat ingestion
+    WINDOW_CACHE_SIZE: int = int(os.getenv("WINDOW_CACHE_SIZE", 10000))
+    WINDOW_CACHE_GRACE_SECONDS: int = int(os.getenv("WINDOW_CACHE_GRACE_SECONDS", 60))
+
+    # Write-behind ingestion buffer for POST /heartbeats
+    WRITE_BEHIND_BUFFER_SIZE: int = int(os.getenv("WRITE_BEHIND_BUFFER_SIZE", 10000))
+    WRITE_BEHIND_FLUSH_MS: int = int(os.getenv("WRITE_BEHIND_FLUSH_MS", 200))
+    WRITE_BEHIND_FLUSH_RECORDS: int = int(os.getenv("WRITE_BEHIND_FLUSH_RECORDS", 500))
+
+    # Embedded Redis stream ingestion (replaces the monitor-queue HTTP hop)
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
+    STREAM_NAME: str = os.getenv("STREAM_NAME", "reports")
+    # >0: read the shards "<STREAM_NAME>:0".."<STREAM_NAME>:N-1" instead of STREAM_NAME
+    STREAM_SHARDS: int = int(os.getenv("STREAM_SHARDS", 0))
+    STREAM_CONSUMER_GROUP: str = os.getenv("STREAM_CONSUMER_GROUP", "monitor-queue-group")
+    STREAM_DLQ: str = os.getenv("STREAM_DLQ", "reports:dlq")
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", 100))
+    STREAM_BLOCK_MS: int = int(os.getenv("STREAM_BLOCK_MS", 1000))
+    # Stable across restarts so the consumer can pick its own PEL back up; "" = monitor-<hostname>
+    STREAM_CONSUMER_NAME: str = os.getenv("STREAM_CONSUMER_NAME", "")
+    STREAM_RECLAIM_INTERVAL_S: float = float(os.getenv("STREAM_RECLAIM_INTERVAL_S", 30))
+    STREAM_RECLAIM_IDLE_MS: int = int(os.getenv("STREAM_RECLAIM_IDLE_MS", 60000))
+    STREAM_MAX_DELIVERIES: int = int(os.getenv("STREAM_MAX_DELIVERIES", 5))
+
     # Feature flags
     CREATE_SCHEMA_ON_STARTUP: bool = os.getenv(
         "CREATE_SCHEMA_ON_STARTUP", "true"
     ).lower() in {"1", "true", "yes"}
+    STREAM_INGESTION_ENABLED: bool = os.getenv(
+        "STREAM_INGESTION_ENABLED", "false"
+    ).lower() in {"1", "true", "yes"}
+    SWEEPER_ENABLED: bool = os.getenv(
+        "SWEEPER_ENABLED", "true"
+    ).lower() in {"1", "true", "yes"}
+    WRITE_BEHIND_ENABLED: bool = os.getenv(
+        "WRITE_BEHIND_ENABLED", "false"
+    ).lower() in {"1", "true", "yes"}
+    RETENTION_ENABLED: bool = os.getenv(
+        "RETENTION_ENABLED", "true"
+    ).lower() in {"1", "true", "yes"}
 
 
 @dataclass
@@ -39,6 +100,9 @@ class TestingConfig(Config):
     TESTING: bool = True
     SQLALCHEMY_DATABASE_URI: str = "sqlite:///:memory:"
     CREATE_SCHEMA_ON_STARTUP: bool = True
+    STREAM_INGESTION_ENABLED: bool = False
+    SWEEPER_ENABLED: bool = False
+    WRITE_BEHIND_ENABLED: bool = False
 
 
 @dataclass
@@ -0,0 +1,59 @@
+"""Dialect-specific SQL helpers (MySQL in production, SQLite in tests)."""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Sequence
+
+from sqlalchemy import Table, func, text
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.sql.dml import Insert
+
+from monitor.modelos import db
+
+
+def dialect_name() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def add_seconds(value, seconds):
+    """``value + seconds`` for a datetime column and an integer expression.
+
+    SQLite keeps datetimes as ``YYYY-MM-DD HH:MM:SS.ffffff`` text; the result
+    keeps that layout (to the millisecond), so it still compares as text.
+    """
+    if dialect_name() == "mysql":
+        return func.timestampadd(text("SECOND"), seconds, value)
+    return func.strftime("%Y-%m-%d %H:%M:%f", value, func.printf("%d seconds", seconds))
+
+
+def greatest(*values):
+    """Row-wise maximum: ``GREATEST`` on MySQL, multi-argument ``MAX`` on SQLite."""
+    if dialect_name() == "mysql":
+        return func.greatest(*values)
+    return func.max(*values)
+
+
+def upsert(
+    table: Table,
+    conflict_columns: Sequence[str],
+    on_conflict: Callable[[object], Dict[str, object]] | None = None,
+) -> Insert:
+    """``INSERT`` that resolves unique-key conflicts instead of failing.
+
+    ``on_conflict`` receives the incoming row (``VALUES()`` on MySQL,
+    ``excluded`` on SQLite) and returns the column assignments to apply to the
+    existing row. Without it, conflicting rows are left untouched.
+    """
+    if dialect_name() == "mysql":
+        stmt = mysql.insert(table)
+        if on_conflict is None:
+            key = conflict_columns[0]
+            return stmt.on_duplicate_key_update({key: table.c[key]})
+        return stmt.on_duplicate_key_update(on_conflict(stmt.inserted))
+
+    stmt = sqlite.insert(table)
+    if on_conflict is None:
+        return stmt.on_conflict_do_nothing(index_elements=list(conflict_columns))
+    return stmt.on_conflict_do_update(
+        index_elements=list(conflict_columns), set_=on_conflict(stmt.excluded)
+    )
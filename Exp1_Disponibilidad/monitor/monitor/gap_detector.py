@@ -0,0 +1,201 @@
+"""Early detection of skipped heartbeats in OPEN windows.
+
+Payment services report on ticks ``window_from + k * HEARTBEAT_INTERVAL_SECONDS``.
+For every window that has reported at least once the detector keeps the due
+time of its next tick (plus ``GAP_GRACE_SECONDS``) in a min-heap. Each ingested
+heartbeat moves the window's deadline to the tick after it; a deadline that
+passes without a heartbeat flags the window as degraded immediately, instead of
+waiting for the sweep to close the window. A later heartbeat clears the flag
+but the missed-tick count is kept until the window is closed.
+
+The schedule is per process: it only sees heartbeats ingested by this replica.
+A daemon thread (:meth:`GapDetector.start`) runs :meth:`GapDetector.check` every
+``HEARTBEAT_INTERVAL_SECONDS`` on every replica, so overdue deadlines are popped
+and windows past their end are dropped even when ``/windows/degraded`` is never
+polled and the replica is not the sweep leader. Newly degraded windows are
+logged and counted in ``flagged_total``.
+
+Deadlines are compared with the wall clock, or with ``SWEEP_CLOCK=heartbeat``
+with each service's latest ingested timestamp (see ``watermarks``), so
+simulated traffic that lags real time is not flagged as soon as it arrives.
+A service this replica has not heard from for ``SWEEP_WATERMARK_MAX_LAG_SECONDS``
+falls back to the wall clock, so a crashed service is still flagged.
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from flask import current_app
+
+from monitor.modelos import utcnow
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class _Schedule:
+    window_uuid: str
+    service_name: str
+    window_from: datetime
+    window_to: datetime
+    next_tick: int = 0
+    last_tick: int = -1
+    missed_ticks: int = 0
+    degraded_since: datetime | None = None
+    generation: int = 0
+
+
+class GapDetector:
+    def __init__(
+        self,
+        interval_seconds: int,
+        grace_seconds: int,
+        event_time: bool = False,
+        max_lag_seconds: int = 0,
+    ) -> None:
+        self.interval = timedelta(seconds=interval_seconds)
+        self.grace = timedelta(seconds=grace_seconds)
+        self.event_time = event_time
+        self.max_lag = timedelta(seconds=max_lag_seconds)
+        self._windows: Dict[str, _Schedule] = {}
+        # One deadline heap per service, since each service may run on its own clock.
+        self._heaps: Dict[str, List[Tuple[datetime, str, int]]] = {}
+        self._watermarks: Dict[str, datetime] = {}
+        self._heard_at: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.flagged_total = 0
+
+    def start(self) -> "GapDetector":
+        """Run :meth:`check` every interval in a daemon thread."""
+        threading.Thread(target=self._run, name="gap-detector", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval.total_seconds()):
+            try:
+                self.check()
+            except Exception:
+                log.exception("Gap check failed")
+
+    def observe(self, window: object, report_timestamp: datetime) -> None:
+        """Record a heartbeat of ``window`` (anything with the window identity fields)."""
+        window_from = _as_utc(window.window_from)
+        report_timestamp = _as_utc(report_timestamp)
+        tick = int((report_timestamp - window_from) / self.interval)
+        with self._lock:
+            self._heard_at[window.service_name] = utcnow()
+            mark = self._watermarks.get(window.service_name)
+            if mark is None or report_timestamp > mark:
+                self._watermarks[window.service_name] = report_timestamp
+            schedule = self._windows.get(window.window_uuid)
+            if schedule is None:
+                schedule = _Schedule(
+                    window_uuid=window.window_uuid,
+                    service_name=window.service_name,
+                    window_from=window_from,
+                    window_to=_as_utc(window.window_to),
+                )
+                self._windows[window.window_uuid] = schedule
+            if tick <= schedule.last_tick:
+                return  # late or duplicate heartbeat for a tick already seen
+            schedule.last_tick = tick
+            schedule.next_tick = tick + 1
+            schedule.degraded_since = None
+            self._schedule_next(schedule)
+
+    def check(self, now: datetime | None = None) -> int:
+        """Flag every window whose next tick is overdue by more than the grace period.
+
+        Returns the number of windows that became degraded in this call.
+        """
+        wall = now or utcnow()
+        flagged: List[_Schedule] = []
+        with self._lock:
+            for service, heap in self._heaps.items():
+                clock = self._clock(service, wall)
+                while heap and heap[0][0] <= clock:
+                    due, window_uuid, generation = heapq.heappop(heap)
+                    schedule = self._windows.get(window_uuid)
+                    if schedule is None or schedule.generation != generation:
+                        continue  # superseded by a newer heartbeat
+                    schedule.missed_ticks += 1
+                    if schedule.degraded_since is None:
+                        schedule.degraded_since = due
+                        flagged.append(schedule)
+                    schedule.next_tick += 1
+                    self._schedule_next(schedule)
+            for window_uuid in [
+                uuid for uuid, schedule in self._windows.items()
+                if schedule.window_to + self.interval + self.grace
+                <= self._clock(schedule.service_name, wall)
+            ]:
+                del self._windows[window_uuid]
+            self.flagged_total += len(flagged)
+        for schedule in flagged:
+            log.warning(
+                "Window %s of '%s' degraded: tick due at %s not received",
+                schedule.window_uuid, schedule.service_name, schedule.degraded_since.isoformat(),
+            )
+        return len(flagged)
+
+    def forget(self, window_uuids) -> None:
+        with self._lock:
+            for window_uuid in window_uuids:
+                self._windows.pop(window_uuid, None)
+
+    def degraded(self) -> List[Dict[str, object]]:
+        self.check()
+        with self._lock:
+            flagged = [s for s in self._windows.values() if s.degraded_since is not None]
+        return [
+            {
+                "window_uuid": s.window_uuid,
+                "service": s.service_name,
+                "window_from": s.window_from.isoformat(),
+                "window_to": s.window_to.isoformat(),
+                "missed_ticks": s.missed_ticks,
+                "degraded_since": s.degraded_since.isoformat(),
+                "next_tick_due": self._tick_at(s).isoformat(),
+            }
+            for s in sorted(flagged, key=lambda s: s.degraded_since)
+        ]
+
+    def _clock(self, service_name: str, wall: datetime) -> datetime:
+        if not self.event_time:
+            return wall
+        mark = self._watermarks.get(service_name)
+        heard_at = self._heard_at.get(service_name)
+        if mark is None or heard_at is None or wall - heard_at >= self.max_lag:
+            return wall  # silent service: its missed ticks are real
+        return mark
+
+    def _tick_at(self, schedule: _Schedule) -> datetime:
+        return schedule.window_from + schedule.next_tick * self.interval
+
+    def _schedule_next(self, schedule: _Schedule) -> None:
+        schedule.generation += 1
+        tick_at = self._tick_at(schedule)
+        if tick_at > schedule.window_to:
+            return  # no more ticks expected; the sweep takes it from here
+        heapq.heappush(
+            self._heaps.setdefault(schedule.service_name, []),
+            (tick_at + self.grace, schedule.window_uuid, schedule.generation),
+        )
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite drops the offset; stored values are always UTC.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def gap_detector() -> GapDetector | None:
+    return current_app.extensions.get("gap_detector")
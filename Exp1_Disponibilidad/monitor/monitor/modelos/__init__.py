@@ -1 +1,11 @@
-from .modelos import db, HeartbeatEvent, HeartbeatStatus, MonitoringWindow, WindowState
+from .modelos import (
+    db,
+    AvailabilityRollup,
+    HeartbeatEvent,
+    HeartbeatStatus,
+    MonitoringWindow,
+    RetentionCursor,
+    ServiceWatermark,
+    WindowState,
+    utcnow,
+)
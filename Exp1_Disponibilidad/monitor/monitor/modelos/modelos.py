@@ -28,7 +28,12 @@ class WindowState(enum.Enum):
 
 class MonitoringWindow(db.Model):
     __tablename__ = "monitoring_windows"
-    __table_args__ = (db.UniqueConstraint("window_uuid", name="uq_window_uuid"),)
+    __table_args__ = (
+        db.UniqueConstraint("window_uuid", name="uq_window_uuid"),
+        db.Index("ix_status_window_to", "status", "window_to"),
+        db.Index("ix_closed_at", "closed_at"),
+        db.Index("ix_window_to", "window_to"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     window_uuid = db.Column(db.String(64), nullable=False)
@@ -79,3 +84,42 @@ class HeartbeatEvent(db.Model):
     ingested_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
 
     window = db.relationship("MonitoringWindow", back_populates="heartbeats")
+
+
+class ServiceWatermark(db.Model):
+    """Latest heartbeat ``report_timestamp`` ingested per service (``SWEEP_CLOCK=heartbeat``)."""
+
+    __tablename__ = "service_watermarks"
+
+    service_name = db.Column(db.String(120), primary_key=True)
+    watermark = db.Column(db.DateTime(timezone=True), nullable=False)
+    # Wall-clock time of the latest heartbeat ingested for the service
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class RetentionCursor(db.Model):
+    """``closed_at`` below which the heartbeats of every window were already purged."""
+
+    __tablename__ = "retention_cursors"
+
+    name = db.Column(db.String(64), primary_key=True)
+    purged_before = db.Column(db.DateTime(timezone=True), nullable=False)
+
+
+class AvailabilityRollup(db.Model):
+    """Per-service OK/ERROR/MISSING heartbeat counts per minute or hour bucket."""
+
+    __tablename__ = "availability_rollups"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "service_name", "granularity", "bucket_start", name="uq_rollup_bucket"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_name = db.Column(db.String(120), nullable=False)
+    granularity = db.Column(db.String(8), nullable=False)
+    bucket_start = db.Column(db.DateTime(timezone=True), nullable=False)
+    ok_count = db.Column(db.Integer, default=0, nullable=False)
+    error_count = db.Column(db.Integer, default=0, nullable=False)
+    missing_count = db.Column(db.Integer, default=0, nullable=False)
@@ -0,0 +1,105 @@
+"""Keyset pagination and NDJSON streaming for the listing endpoints.
+
+Results are ordered by ``(sort_column, id)`` and each page continues strictly
+after the last row of the previous one, so deep pages cost the same as the
+first (no ``OFFSET``). The cursor is that last ``(sort value, id)`` pair,
+base64-encoded. With ``Accept: application/x-ndjson`` the whole result set is
+streamed one JSON document per line, fetched internally page by page, so memory
+stays constant however many rows are exported.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Callable, Dict, Iterator, Tuple
+
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+NDJSON = "application/x-ndjson"
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STREAM_PAGE_SIZE = 1000
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` for malformed cursors."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        parsed = datetime.fromisoformat(sort_value)
+    except (TypeError, ValueError, UnicodeEncodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed, int(row_id)
+
+
+def keyset_response(
+    query: Query,
+    sort_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    serialize: Callable[[object], Dict[str, object]],
+    key: str,
+) -> Response:
+    """Render ``query`` as one JSON page (``key`` + ``next_cursor``) or as an NDJSON stream."""
+    try:
+        cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        limit = min(max(1, int(request.args.get("limit", DEFAULT_LIMIT))), MAX_LIMIT)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
+
+    query = query.order_by(sort_column, id_column)
+
+    if request.accept_mimetypes.best_match(["application/json", NDJSON]) == NDJSON:
+        rows = _stream_rows(query, sort_column, id_column, serialize, cursor)
+        return Response(stream_with_context(rows), mimetype=NDJSON)
+
+    page = _after(query, sort_column, id_column, cursor).limit(limit + 1).all()
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    return jsonify({key: [serialize(row) for row in page], "next_cursor": next_cursor})
+
+
+def _after(
+    query: Query,
+    sort_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    cursor: Cursor | None,
+) -> Query:
+    if cursor is None:
+        return query
+    sort_value, row_id = cursor
+    return query.filter(
+        or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
+    )
+
+
+def _stream_rows(
+    query: Query,
+    sort_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    serialize: Callable[[object], Dict[str, object]],
+    cursor: Cursor | None,
+) -> Iterator[str]:
+    while True:
+        page = _after(query, sort_column, id_column, cursor).limit(STREAM_PAGE_SIZE).all()
+        for row in page:
+            yield json.dumps(serialize(row)) + "\n"
+        if len(page) < STREAM_PAGE_SIZE:
+            return
+        last = page[-1]
+        cursor = (getattr(last, sort_column.key), last.id)
@@ -0,0 +1,114 @@
+"""Time-based retention for ``heartbeat_events``.
+
+Heartbeats of windows closed longer ago than the retention horizon are deleted
+in small chunks, each in its own short transaction, so the purge never holds
+long locks on the table and ingestion keeps flowing between chunks. Windows and
+``availability_rollups`` are kept: closed windows keep their counters and the
+rollups keep the history the availability API needs.
+
+A pass deletes at most ``RETENTION_MAX_CHUNKS`` chunks, so the sweeper (which
+runs it under its leader lock) never stalls window sweeps behind a large
+backlog; an unfinished pass reports ``complete: False`` and the sweeper resumes
+it on its next tick. Each completed purge stores its cutoff in
+``retention_cursors``; the next one only looks at windows closed since then
+(``closed_at >= purged_before``, a range on ``ix_closed_at``) instead of
+re-joining every window ever closed.
+
+MySQL range partitioning on ``ingested_at`` was ruled out: partitioned InnoDB
+tables cannot have foreign keys, and ``heartbeat_events.window_id`` references
+``monitoring_windows``.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from monitor.modelos import HeartbeatEvent, MonitoringWindow, RetentionCursor, db, utcnow
+
+from .dialects import greatest, upsert
+
+log = logging.getLogger(__name__)
+
+_CURSOR = "heartbeat_events"
+
+
+def purge_expired_heartbeats(
+    horizon: timedelta | None = None,
+    chunk_size: int | None = None,
+    max_chunks: int | None = None,
+) -> Dict[str, object]:
+    """Delete heartbeats of windows closed before ``now - horizon`` and report the totals."""
+    config = current_app.config
+    if horizon is None:
+        horizon = timedelta(hours=config["HEARTBEAT_RETENTION_HOURS"])
+    chunk_size = chunk_size or config["RETENTION_CHUNK_SIZE"]
+    if max_chunks is None:
+        max_chunks = config["RETENTION_MAX_CHUNKS"]
+    pause_s = config["RETENTION_PAUSE_MS"] / 1000
+    cutoff = utcnow() - horizon
+    started = time.monotonic()
+
+    purged_before = db.session.scalar(
+        select(RetentionCursor.purged_before).where(RetentionCursor.name == _CURSOR)
+    )
+    expired_ids = (
+        select(HeartbeatEvent.id)
+        .join(MonitoringWindow, HeartbeatEvent.window_id == MonitoringWindow.id)
+        .where(MonitoringWindow.closed_at < cutoff)
+        .limit(chunk_size)
+    )
+    if purged_before is not None:
+        expired_ids = expired_ids.where(MonitoringWindow.closed_at >= purged_before)
+
+    deleted = chunks = 0
+    complete = False
+    while max_chunks <= 0 or chunks < max_chunks:
+        if chunks:
+            time.sleep(pause_s)
+        ids = db.session.execute(expired_ids).scalars().all()
+        if not ids:
+            complete = True
+            break
+        db.session.execute(delete(HeartbeatEvent).where(HeartbeatEvent.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        chunks += 1
+        if len(ids) < chunk_size:
+            complete = True
+            break
+
+    # Only once the range is empty, so an unfinished or failed pass is picked up again.
+    if complete:
+        _advance_cursor(cutoff)
+    report = {
+        "cutoff": cutoff.isoformat(),
+        "deleted_heartbeats": deleted,
+        "chunks": chunks,
+        "complete": complete,
+        "elapsed_s": round(time.monotonic() - started, 3),
+    }
+    if deleted:
+        log.info(
+            "Purged %d heartbeats of windows closed before %s in %d chunks",
+            deleted, report["cutoff"], chunks,
+        )
+    return report
+
+
+def _advance_cursor(cutoff: datetime) -> None:
+    table = RetentionCursor.__table__
+    db.session.execute(
+        upsert(
+            table,
+            ["name"],
+            lambda incoming: {"purged_before": greatest(table.c.purged_before, incoming.purged_before)},
+        ),
+        [{"name": _CURSOR, "purged_before": cutoff}],
+    )
+    db.session.commit()
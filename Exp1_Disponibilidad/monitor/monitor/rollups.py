@@ -0,0 +1,103 @@
+"""Availability rollups: heartbeat counts per service and minute/hour bucket.
+
+Ingestion and the sweep add their heartbeats to ``availability_rollups`` with
+one upsert per statement (``ok_count = ok_count + VALUES(ok_count)``), so the
+availability API reads a handful of pre-aggregated rows instead of scanning
+``heartbeat_events``.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select
+
+from monitor.modelos import AvailabilityRollup, HeartbeatStatus, db
+
+from .dialects import upsert
+
+GRANULARITIES = ("minute", "hour")
+COUNT_COLUMNS = {
+    HeartbeatStatus.OK: "ok_count",
+    HeartbeatStatus.ERROR: "error_count",
+    HeartbeatStatus.MISSING: "missing_count",
+}
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def record_heartbeats(rows: Iterable[Dict[str, object]]) -> None:
+    """Add heartbeat rows (``service_name``, ``status``, ``report_timestamp``) to every rollup."""
+    buckets: Dict[Tuple[str, str, datetime], Dict[str, int]] = {}
+    for row in rows:
+        column = COUNT_COLUMNS[row["status"]]
+        for granularity in GRANULARITIES:
+            key = (row["service_name"], granularity, bucket_start(row["report_timestamp"], granularity))
+            counts = buckets.setdefault(key, dict.fromkeys(COUNT_COLUMNS.values(), 0))
+            counts[column] += 1
+    if not buckets:
+        return
+
+    table = AvailabilityRollup.__table__
+    stmt = upsert(
+        table,
+        ["service_name", "granularity", "bucket_start"],
+        lambda incoming: {
+            column: table.c[column] + incoming[column] for column in COUNT_COLUMNS.values()
+        },
+    )
+    db.session.execute(
+        stmt,
+        # Sorted by the unique key so concurrent batches lock the buckets in the same order.
+        [
+            {"service_name": service, "granularity": granularity, "bucket_start": start, **counts}
+            for (service, granularity, start), counts in sorted(buckets.items())
+        ],
+    )
+
+
+def availability(
+    service_name: str, start: datetime, end: datetime, granularity: str
+) -> Dict[str, object]:
+    table = AvailabilityRollup.__table__
+    result = db.session.execute(
+        select(table.c.bucket_start, table.c.ok_count, table.c.error_count, table.c.missing_count)
+        .where(
+            table.c.service_name == service_name,
+            table.c.granularity == granularity,
+            table.c.bucket_start >= bucket_start(start, granularity),
+            table.c.bucket_start < end,
+        )
+        .order_by(table.c.bucket_start)
+    )
+
+    buckets: List[Dict[str, object]] = []
+    totals = {"ok": 0, "error": 0, "missing": 0}
+    for row in result:
+        counts = {"ok": row.ok_count, "error": row.error_count, "missing": row.missing_count}
+        for key, value in counts.items():
+            totals[key] += value
+        buckets.append({"bucket_start": row.bucket_start.isoformat(), **_with_ratio(counts)})
+
+    return {
+        "service": service_name,
+        "granularity": granularity,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "totals": _with_ratio(totals),
+        "buckets": buckets,
+    }
+
+
+def _with_ratio(counts: Dict[str, int]) -> Dict[str, object]:
+    total = sum(counts.values())
+    return {
+        **counts,
+        "total": total,
+        "availability": round(counts["ok"] / total, 4) if total else None,
+    }
@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
 from typing import Dict, List, Tuple
 
 from flask import Response, current_app, jsonify, request
+from sqlalchemy import bindparam, case, func, insert, literal, select, update
+from sqlalchemy.engine import Row
 
 # from ..modelos.modelos import (
 from monitor.modelos import (
@@ -15,9 +17,17 @@ from monitor.modelos import (
     MonitoringWindow,
     WindowState,
     db,
+    utcnow,
 )
 
 from . import monitor_bp
+from .dialects import dialect_name, upsert
+from .gap_detector import gap_detector
+from .pagination import keyset_response
+from .retention import purge_expired_heartbeats
+from .rollups import GRANULARITIES, availability, record_heartbeats
+from .watermarks import advance_watermarks, expired
+from .window_cache import CachedWindow, window_cache
 
 ISO_FORMATS = ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%SZ")
 REQUIRED_FIELDS = [
@@ -34,127 +44,396 @@ REQUIRED_FIELDS = [
 def ingest_heartbeat() -> Response:
     payload = request.get_json(force=True, silent=True) or {}
 
-    missing = [field for field in REQUIRED_FIELDS if field not in payload or payload[field] in (None, "")]
-    if missing:
+    data, error = _validate_heartbeat(payload)
+    if error:
+        return jsonify(error), HTTPStatus.BAD_REQUEST
+
+    buffer = current_app.extensions.get("write_behind")
+    if buffer is not None:
+        if not buffer.offer(data):
+            return (
+                jsonify({"error": "ingestion buffer full"}),
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"Retry-After": "1"},
+            )
+        return (
+            jsonify({"status": "buffered", "window_uuid": data["window_uuid"]}),
+            HTTPStatus.ACCEPTED,
+        )
+
+    heartbeat, cached = _store_heartbeat(data)
+    db.session.commit()
+    window = db.session.get(MonitoringWindow, cached.id)
+
+    return (
+        jsonify({
+            "heartbeat": _heartbeat_to_dict(heartbeat),
+            "window": _window_to_dict(window),
+        }),
+        HTTPStatus.ACCEPTED,
+    )
+
+
+@monitor_bp.route("/heartbeats/batch", methods=["POST"])
+def ingest_heartbeat_batch() -> Response:
+    payload = request.get_json(force=True, silent=True)
+    items = payload.get("heartbeats") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
         return (
-            jsonify({"error": "missing required fields", "fields": missing}),
+            jsonify({"error": "expected a JSON array of heartbeats"}),
             HTTPStatus.BAD_REQUEST,
         )
 
+    accepted, errors = _ingest_batch(items)
+    db.session.commit()
+
+    return (
+        jsonify({"accepted": accepted, "rejected": len(errors), "errors": errors}),
+        HTTPStatus.ACCEPTED,
+    )
+
+
+@monitor_bp.route("/windows", methods=["GET"])
+def list_windows() -> Response:
+    query = MonitoringWindow.query
     try:
-        status_value, error_message = _normalize_status(payload["status"])
+        if request.args.get("service"):
+            query = query.filter(MonitoringWindow.service_name == request.args["service"])
+        if request.args.get("status"):
+            query = query.filter(MonitoringWindow.status == WindowState(request.args["status"].lower()))
+        query = _filter_time_range(query, MonitoringWindow.window_to)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
 
-    try:
-        window_from = _parse_iso_datetime(payload["window_from"])
-        window_to = _parse_iso_datetime(payload["window_to"])
-        timestamp = _parse_iso_datetime(payload["timestamp"])
-    except ValueError:
-        return jsonify({"error": "Invalid datetime format"}), HTTPStatus.BAD_REQUEST
+    return keyset_response(
+        query, MonitoringWindow.window_to, MonitoringWindow.id, _window_to_dict, "windows"
+    )
 
-    error_status_no_reportado = payload.get("error_status_no_reportado")
-    error_status_generado = payload.get("error_status_generado")
 
-    window = _get_or_create_window(
-        window_uuid=str(payload["window_uuid"]),
-        service_name=str(payload["service"]),
-        window_from=window_from,
-        window_to=window_to,
-        error_status_no_reportado=error_status_no_reportado,
-        error_status_generado=error_status_generado,
-    )
+@monitor_bp.route("/windows/degraded", methods=["GET"])
+def list_degraded_windows() -> Response:
+    detector = gap_detector()
+    degraded = detector.degraded() if detector is not None else []
+    flagged_total = detector.flagged_total if detector is not None else 0
+    return jsonify({"degraded_windows": degraded, "flagged_total": flagged_total})
 
-    heartbeat = HeartbeatEvent(
-        window=window,
-        service_name=window.service_name,
-        status=status_value,
-        error_message=error_message,
-        report_timestamp=timestamp,
-        window_from=window.window_from,
-        window_to=window.window_to,
-    )
-    db.session.add(heartbeat)
 
-    window.received_reports += 1
-    if status_value == HeartbeatStatus.ERROR:
-        window.error_reports += 1
+@monitor_bp.route("/windows/<string:window_uuid>/heartbeats", methods=["GET"])
+def list_window_heartbeats(window_uuid: str) -> Response:
+    window = MonitoringWindow.query.filter_by(window_uuid=window_uuid).one_or_none()
+    if window is None:
+        return jsonify({"error": "window not found"}), HTTPStatus.NOT_FOUND
 
-    db.session.commit()
+    query = HeartbeatEvent.query.filter(HeartbeatEvent.window_id == window.id)
+    try:
+        if request.args.get("status"):
+            query = query.filter(HeartbeatEvent.status == HeartbeatStatus(request.args["status"].lower()))
+        query = _filter_time_range(query, HeartbeatEvent.report_timestamp)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
 
-    return (
-        jsonify({
-            "heartbeat": _heartbeat_to_dict(heartbeat),
-            "window": _window_to_dict(window),
-        }),
-        HTTPStatus.ACCEPTED,
+    return keyset_response(
+        query, HeartbeatEvent.report_timestamp, HeartbeatEvent.id, _heartbeat_to_dict, "heartbeats"
     )
 
 
 @monitor_bp.route("/windows/sweep", methods=["POST"])
 def sweep_windows() -> Response:
     payload = request.get_json(force=False, silent=True) or {}
-    now = datetime.now(timezone.utc)
+    summary = _sweep_expired_windows(window_uuid=payload.get("window_uuid"))
+    return jsonify(summary)
+
+
+@monitor_bp.route("/heartbeats/purge", methods=["POST"])
+def purge_heartbeats() -> Response:
+    payload = request.get_json(force=False, silent=True) or {}
+    horizon = None
+    if payload.get("retention_hours") is not None:
+        try:
+            horizon = timedelta(hours=float(payload["retention_hours"]))
+        except (TypeError, ValueError):
+            return jsonify({"error": "retention_hours must be a number"}), HTTPStatus.BAD_REQUEST
+    return jsonify(purge_expired_heartbeats(horizon))
+
+
+@monitor_bp.route("/services/<string:service_name>/availability", methods=["GET"])
+def service_availability(service_name: str) -> Response:
+    granularity = request.args.get("granularity", "minute")
+    if granularity not in GRANULARITIES:
+        return (
+            jsonify({"error": f"granularity must be one of {list(GRANULARITIES)}"}),
+            HTTPStatus.BAD_REQUEST,
+        )
+
+    try:
+        end = _parse_iso_datetime(request.args["to"]) if request.args.get("to") else utcnow()
+        default_span = timedelta(hours=1) if granularity == "minute" else timedelta(days=1)
+        start = (
+            _parse_iso_datetime(request.args["from"])
+            if request.args.get("from")
+            else end - default_span
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid datetime format"}), HTTPStatus.BAD_REQUEST
+
+    return jsonify(availability(service_name, start, end, granularity))
+
+
+@monitor_bp.route("/write-behind/stats", methods=["GET"])
+def write_behind_stats() -> Response:
+    buffer = current_app.extensions.get("write_behind")
+    if buffer is None:
+        return jsonify({"error": "write-behind ingestion is disabled"}), HTTPStatus.NOT_FOUND
+    return jsonify(buffer.stats())
+
+
+@monitor_bp.route("/window-cache/stats", methods=["GET"])
+def window_cache_stats() -> Response:
+    return jsonify(window_cache().stats())
+
+
+def _validate_heartbeat(
+    payload: object,
+) -> Tuple[Dict[str, object] | None, Dict[str, object] | None]:
+    """Return ``(data, None)`` for a valid heartbeat or ``(None, error_body)``."""
+    if not isinstance(payload, dict):
+        return None, {"error": "heartbeat must be a JSON object"}
+
+    missing = [field for field in REQUIRED_FIELDS if field not in payload or payload[field] in (None, "")]
+    if missing:
+        return None, {"error": "missing required fields", "fields": missing}
+
+    try:
+        status_value, error_message = _normalize_status(str(payload["status"]))
+    except ValueError as exc:
+        return None, {"error": str(exc)}
+
+    try:
+        window_from = _parse_iso_datetime(payload["window_from"])
+        window_to = _parse_iso_datetime(payload["window_to"])
+        timestamp = _parse_iso_datetime(payload["timestamp"])
+    except (TypeError, ValueError):
+        return None, {"error": "Invalid datetime format"}
 
-    query = MonitoringWindow.query.filter(
-        MonitoringWindow.window_to <= now,
-        MonitoringWindow.status == WindowState.OPEN,
+    return {
+        "window_uuid": str(payload["window_uuid"]),
+        "service_name": str(payload["service"]),
+        "status": status_value,
+        "error_message": error_message,
+        "window_from": window_from,
+        "window_to": window_to,
+        "timestamp": timestamp,
+        "error_status_no_reportado": payload.get("error_status_no_reportado"),
+        "error_status_generado": payload.get("error_status_generado"),
+    }, None
+
+
+def _ingest_batch(items: List[object]) -> Tuple[int, List[Dict[str, object]]]:
+    """Validate and stage a list of heartbeats with set-based statements; the caller commits.
+
+    Every referenced window is resolved with one ``IN`` query, missing windows
+    are inserted in bulk, heartbeat rows go out as one multi-row INSERT and each
+    touched window gets a single aggregated counter UPDATE.
+
+    Returns the number of accepted heartbeats and one error entry (with the
+    item's ``index``) per rejected one.
+    """
+    valid: List[Dict[str, object]] = []
+    errors: List[Dict[str, object]] = []
+    for index, item in enumerate(items):
+        data, error = _validate_heartbeat(item)
+        if error:
+            errors.append({"index": index, **error})
+            continue
+        valid.append(data)
+
+    _store_batch(valid)
+    return len(valid), errors
+
+
+def _store_batch(valid: List[Dict[str, object]]) -> None:
+    """Stage already validated heartbeats and their counter deltas; the caller commits."""
+    if not valid:
+        return
+
+    windows = _resolve_windows(valid)
+    detector = gap_detector()
+
+    rows = []
+    deltas: Dict[int, List[int]] = {}
+    for data in valid:
+        window = windows[data["window_uuid"]]
+        rows.append({
+            "window_id": window.id,
+            "service_name": window.service_name,
+            "status": data["status"],
+            "error_message": data["error_message"],
+            "report_timestamp": data["timestamp"],
+            "window_from": window.window_from,
+            "window_to": window.window_to,
+        })
+        if detector is not None:
+            detector.observe(window, data["timestamp"])
+        delta = deltas.setdefault(window.id, [0, 0])
+        delta[0] += 1
+        if data["status"] == HeartbeatStatus.ERROR:
+            delta[1] += 1
+
+    db.session.execute(insert(HeartbeatEvent.__table__), rows)
+    _apply_counter_deltas(deltas)
+    record_heartbeats(rows)
+    advance_watermarks(rows)
+
+
+def _apply_counter_deltas(deltas: Dict[int, List[int]]) -> None:
+    """``SET received_reports = received_reports + :n`` per window, in one executemany.
+
+    The increment happens inside the UPDATE, so concurrent workers ingesting
+    into the same window never lose counts.
+    """
+    windows_table = MonitoringWindow.__table__
+    now = utcnow()
+    db.session.execute(
+        update(windows_table)
+        .where(windows_table.c.id == bindparam("w_id"))
+        .values(
+            received_reports=windows_table.c.received_reports + bindparam("d_received"),
+            error_reports=windows_table.c.error_reports + bindparam("d_errors"),
+            updated_at=bindparam("now"),
+        ),
+        # Sorted by id so concurrent batches lock the window rows in the same order.
+        [
+            {"w_id": window_id, "d_received": received, "d_errors": errored, "now": now}
+            for window_id, (received, errored) in sorted(deltas.items())
+        ],
     )
 
-    if payload.get("window_uuid"):
-        query = query.filter_by(window_uuid=payload["window_uuid"])
 
-    closed_windows: List[Dict[str, object]] = []
+def _resolve_windows(valid: List[Dict[str, object]]) -> Dict[str, CachedWindow]:
+    """Map every referenced ``window_uuid`` to its window, creating missing ones in bulk.
+
+    Windows already in the cache cost no query; the rest are loaded with one
+    ``IN`` query (after an upsert when missing) and added to the cache.
+    """
+    cache = window_cache()
+    windows: Dict[str, CachedWindow] = {}
+    first_by_uuid: Dict[str, Dict[str, object]] = {}
+    for data in valid:
+        uuid = data["window_uuid"]
+        if uuid in windows or uuid in first_by_uuid:
+            continue
+        cached = cache.get(uuid)
+        if cached is not None and not _needs_backfill(cached, data):
+            windows[uuid] = cached
+        else:
+            first_by_uuid[uuid] = data
 
-    for window in query.all():
-        missing = window.missing_count()
-        if missing > 0:
-            _create_missing_heartbeats(window, missing)
-            window.error_reports += missing
-            window.received_reports += missing
-        window.mark_closed(alert=missing > 0)
-        closed_windows.append(_window_to_dict(window))
+    if not first_by_uuid:
+        return windows
 
-    db.session.commit()
+    columns = [
+        getattr(MonitoringWindow, field) for field in CachedWindow.__dataclass_fields__
+    ]
 
-    return jsonify({"closed_windows": closed_windows})
+    def load() -> Dict[str, Row]:
+        result = db.session.execute(
+            select(*columns).where(MonitoringWindow.window_uuid.in_(list(first_by_uuid)))
+        )
+        return {row.window_uuid: row for row in result}
+
+    loaded = load()
+    pending = [
+        data
+        for uuid, data in first_by_uuid.items()
+        if uuid not in loaded or _needs_backfill(loaded[uuid], data)
+    ]
+    if pending:
+        _upsert_windows(pending)
+        loaded = load()
+
+    for uuid, row in loaded.items():
+        windows[uuid] = CachedWindow.from_row(row)
+        cache.put(windows[uuid])
+    return windows
+
+
+def _needs_backfill(window: object, data: Dict[str, object]) -> bool:
+    return any(
+        data[field] is not None and getattr(window, field) is None
+        for field in ("error_status_no_reportado", "error_status_generado")
+    )
 
 
-def _get_or_create_window(
-    *,
-    window_uuid: str,
-    service_name: str,
-    window_from: datetime,
-    window_to: datetime,
-    error_status_no_reportado: float | None = None,
-    error_status_generado: float | None = None,
-) -> MonitoringWindow:
-    window = MonitoringWindow.query.filter_by(window_uuid=window_uuid).one_or_none()
-    if window:
-        if error_status_no_reportado is not None and window.error_status_no_reportado is None:
-            window.error_status_no_reportado = float(error_status_no_reportado)
-        if error_status_generado is not None and window.error_status_generado is None:
-            window.error_status_generado = float(error_status_generado)
-        return window
-
-    expected_reports = _calculate_expected_reports(window_from, window_to)
-    window = MonitoringWindow(
-        window_uuid=window_uuid,
-        service_name=service_name,
-        window_from=window_from,
-        window_to=window_to,
-        error_status_no_reportado=float(error_status_no_reportado)
-        if error_status_no_reportado is not None
-        else None,
-        error_status_generado=float(error_status_generado)
-        if error_status_generado is not None
-        else None,
-        expected_reports=expected_reports,
-        status=WindowState.OPEN,
+def _upsert_windows(items: List[Dict[str, object]]) -> None:
+    """Create windows with ``INSERT ... ON DUPLICATE KEY UPDATE`` on ``uq_window_uuid``.
+
+    A window created concurrently by another worker is not an error; only its
+    missing error rates are filled in (``COALESCE`` keeps existing values).
+    """
+    table = MonitoringWindow.__table__
+    now = utcnow()
+    stmt = upsert(
+        table,
+        ["window_uuid"],
+        lambda incoming: {
+            field: func.coalesce(table.c[field], incoming[field])
+            for field in ("error_status_no_reportado", "error_status_generado")
+        },
+    )
+    db.session.execute(
+        stmt,
+        [
+            {
+                "window_uuid": data["window_uuid"],
+                "service_name": data["service_name"],
+                "window_from": data["window_from"],
+                "window_to": data["window_to"],
+                "error_status_no_reportado": _optional_float(data["error_status_no_reportado"]),
+                "error_status_generado": _optional_float(data["error_status_generado"]),
+                "expected_reports": _calculate_expected_reports(data["window_from"], data["window_to"]),
+                "received_reports": 0,
+                "error_reports": 0,
+                "missing_reports": 0,
+                "status": WindowState.OPEN,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for data in items
+        ],
+    )
+
+
+def _optional_float(value: object) -> float | None:
+    return float(value) if value is not None else None
+
+
+def _store_heartbeat(data: Dict[str, object]) -> Tuple[HeartbeatEvent, CachedWindow]:
+    window = _resolve_windows([data])[data["window_uuid"]]
+
+    heartbeat = HeartbeatEvent(
+        window_id=window.id,
+        service_name=window.service_name,
+        status=data["status"],
+        error_message=data["error_message"],
+        report_timestamp=data["timestamp"],
+        window_from=window.window_from,
+        window_to=window.window_to,
     )
-    db.session.add(window)
-    db.session.flush()
-    return window
+    db.session.add(heartbeat)
+
+    _apply_counter_deltas({window.id: [1, int(data["status"] == HeartbeatStatus.ERROR)]})
+    detector = gap_detector()
+    if detector is not None:
+        detector.observe(window, data["timestamp"])
+    rows = [{
+        "service_name": window.service_name,
+        "status": data["status"],
+        "report_timestamp": data["timestamp"],
+    }]
+    record_heartbeats(rows)
+    advance_watermarks(rows)
+
+    return heartbeat, window
 
 
 def _calculate_expected_reports(window_from: datetime, window_to: datetime) -> int:
@@ -166,19 +445,110 @@ def _calculate_expected_reports(window_from: datetime, window_to: datetime) -> i
     return max(1, expected)
 
 
-def _create_missing_heartbeats(window: MonitoringWindow, missing: int) -> None:
-    for _ in range(missing):
-        db.session.add(
-            HeartbeatEvent(
-                window=window,
-                service_name=window.service_name,
-                status=HeartbeatStatus.MISSING,
-                error_message="Generated by sweep: heartbeat missing",
-                report_timestamp=window.window_to,
-                window_from=window.window_from,
-                window_to=window.window_to,
-            )
+def _sweep_expired_windows(
+    window_uuid: str | None = None, chunk_size: int | None = None
+) -> Dict[str, object]:
+    """Close every expired OPEN window, ``chunk_size`` windows per transaction.
+
+    Each chunk costs one SELECT of the window counters (row-locked on MySQL, and
+    skipping rows another sweeper already holds), one multi-row INSERT of the
+    MISSING heartbeats and one UPDATE that computes ``missing_reports``, the
+    counters and the ALERT/CLOSED state in SQL. Returns totals, not windows.
+    """
+    chunk_size = chunk_size or int(current_app.config.get("SWEEP_CHUNK_SIZE", 500))
+    windows_table = MonitoringWindow.__table__
+    now = utcnow()
+    summary = {"closed": 0, "alerts": 0, "missing_reports": 0, "chunks": 0}
+
+    query = (
+        select(
+            windows_table.c.id,
+            windows_table.c.window_uuid,
+            windows_table.c.service_name,
+            windows_table.c.window_from,
+            windows_table.c.window_to,
+            windows_table.c.expected_reports,
+            windows_table.c.received_reports,
+        )
+        .where(
+            windows_table.c.status == WindowState.OPEN,
+            expired(windows_table, now),
+        )
+        .order_by(windows_table.c.window_to)
+        .limit(chunk_size)
+    )
+    if window_uuid:
+        query = query.where(windows_table.c.window_uuid == window_uuid)
+    if dialect_name() == "mysql":
+        query = query.with_for_update(skip_locked=True)
+
+    shortfall = windows_table.c.expected_reports - windows_table.c.received_reports
+    missing = case((shortfall > 0, shortfall), else_=0)
+    status_type = windows_table.c.status.type
+    # MySQL applies SET assignments left to right, so received_reports goes last
+    # and every other expression still sees the pre-sweep value.
+    close_windows = update(windows_table).ordered_values(
+        (windows_table.c.missing_reports, missing),
+        (windows_table.c.error_reports, windows_table.c.error_reports + missing),
+        (
+            windows_table.c.status,
+            case(
+                (shortfall > 0, literal(WindowState.ALERT, status_type)),
+                else_=literal(WindowState.CLOSED, status_type),
+            ),
+        ),
+        (windows_table.c.closed_at, now),
+        (windows_table.c.updated_at, now),
+        (windows_table.c.received_reports, windows_table.c.received_reports + missing),
+    )
+
+    while True:
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+
+        missing_rows = [
+            {
+                "window_id": row.id,
+                "service_name": row.service_name,
+                "status": HeartbeatStatus.MISSING,
+                "error_message": "Generated by sweep: heartbeat missing",
+                "report_timestamp": row.window_to,
+                "window_from": row.window_from,
+                "window_to": row.window_to,
+            }
+            for row in rows
+            for _ in range(max(0, row.expected_reports - row.received_reports))
+        ]
+        if missing_rows:
+            db.session.execute(insert(HeartbeatEvent.__table__), missing_rows)
+            record_heartbeats(missing_rows)
+        db.session.execute(
+            close_windows.where(windows_table.c.id.in_([row.id for row in rows]))
         )
+        db.session.commit()
+        window_cache().evict(row.window_uuid for row in rows)
+        detector = gap_detector()
+        if detector is not None:
+            detector.forget(row.window_uuid for row in rows)
+
+        summary["chunks"] += 1
+        summary["closed"] += len(rows)
+        summary["alerts"] += sum(1 for row in rows if row.expected_reports > row.received_reports)
+        summary["missing_reports"] += len(missing_rows)
+        if len(rows) < chunk_size:
+            break
+
+    return summary
+
+
+def _filter_time_range(query, column):
+    """Apply the ``from`` (inclusive) and ``to`` (exclusive) query args to ``column``."""
+    if request.args.get("from"):
+        query = query.filter(column >= _parse_iso_datetime(request.args["from"]))
+    if request.args.get("to"):
+        query = query.filter(column < _parse_iso_datetime(request.args["to"]))
+    return query
 
 
 def _parse_iso_datetime(value: str) -> datetime:
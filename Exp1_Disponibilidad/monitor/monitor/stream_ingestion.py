@@ -0,0 +1,236 @@
+"""Optional in-process consumer of the Redis ``reports`` stream.
+
+With ``STREAM_SHARDS`` set it reads every shard ``reports:0..N-1`` with one
+``XREADGROUP`` and acks each entry on the shard it came from.
+
+Removes the monitor-queue → HTTP hop: heartbeats are read straight from the
+stream through a consumer group, validated with the same helpers as the REST
+API and written in one transaction per read batch. Entries are acked only after
+that transaction commits; payloads that can never be stored are moved to the
+dead-letter stream.
+
+Batches that fail (e.g. the database is down) stay unacked in the group's PEL.
+The consumer name is stable across restarts (``STREAM_CONSUMER_NAME``, by
+default the hostname), so on startup the consumer first re-reads its own
+pending entries; every ``STREAM_RECLAIM_INTERVAL_S`` it also claims entries
+idle longer than ``STREAM_RECLAIM_IDLE_MS`` from any consumer of the group and
+retries them, dead-lettering the ones already delivered
+``STREAM_MAX_DELIVERIES`` times. This does not depend on monitor-queue
+running.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import redis
+from flask import Flask
+
+from monitor.modelos import db
+from monitor.routes import _ingest_batch
+
+log = logging.getLogger(__name__)
+
+
+def start_stream_ingestion(app: Flask) -> threading.Thread:
+    """Start the ingestion loop in a daemon thread bound to ``app``."""
+    thread = threading.Thread(
+        target=_run, args=(app,), name="stream-ingestion", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _streams(config) -> List[str]:
+    if config["STREAM_SHARDS"] <= 0:
+        return [config["STREAM_NAME"]]
+    return [f"{config['STREAM_NAME']}:{shard}" for shard in range(config["STREAM_SHARDS"])]
+
+
+def _consumer_name(config) -> str:
+    return config["STREAM_CONSUMER_NAME"] or f"monitor-{socket.gethostname()}"
+
+
+def _run(app: Flask) -> None:
+    config = app.config
+    streams = _streams(config)
+    group = config["STREAM_CONSUMER_GROUP"]
+    consumer = _consumer_name(config)
+    r = redis.from_url(config["REDIS_URL"], decode_responses=True)
+
+    for stream in streams:
+        try:
+            r.xgroup_create(stream, group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+    log.info("Ingesting %s as '%s/%s'", ", ".join(streams), group, consumer)
+
+    for stream in streams:
+        _process_own_pending(app, r, stream, consumer)
+
+    next_reclaim = time.monotonic() + config["STREAM_RECLAIM_INTERVAL_S"]
+    while True:
+        if time.monotonic() >= next_reclaim:
+            for stream in streams:
+                _reclaim(app, r, stream, consumer)
+            next_reclaim = time.monotonic() + config["STREAM_RECLAIM_INTERVAL_S"]
+
+        try:
+            results = r.xreadgroup(
+                group,
+                consumer,
+                {stream: ">" for stream in streams},
+                count=config["STREAM_BATCH_SIZE"],
+                block=config["STREAM_BLOCK_MS"],
+            )
+        except redis.exceptions.ConnectionError as exc:
+            log.error("Redis connection error: %s — retrying in 5s", exc)
+            time.sleep(5)
+            continue
+
+        for stream, messages in results or []:
+            _try_ingest(app, r, stream, messages)
+
+
+def _try_ingest(app: Flask, r: redis.Redis, stream: str, messages: List[Tuple[str, dict]]) -> bool:
+    try:
+        _ingest_messages(app, r, stream, messages)
+        return True
+    except Exception:
+        # Nothing was acked; the entries stay in the PEL until _reclaim retries them.
+        log.exception("Failed to ingest %d entries from '%s'", len(messages), stream)
+        time.sleep(1)
+        return False
+
+
+def _process_own_pending(app: Flask, r: redis.Redis, stream: str, consumer: str) -> None:
+    """Re-read (id ``0``) what this consumer left unacked before a restart."""
+    config = app.config
+    last_id = "0"
+    while True:
+        try:
+            results = r.xreadgroup(
+                config["STREAM_CONSUMER_GROUP"], consumer, {stream: last_id},
+                count=config["STREAM_BATCH_SIZE"],
+            )
+        except redis.exceptions.RedisError as exc:
+            log.error("Reading the pending entries of '%s' failed: %s", stream, exc)
+            return
+        messages = [(msg_id, fields) for _s, entries in results or [] for msg_id, fields in entries]
+        if not messages:
+            return
+        last_id = messages[-1][0]
+        # Entries trimmed meanwhile come back without fields; ack them away.
+        gone = [msg_id for msg_id, fields in messages if not fields]
+        if gone:
+            r.xack(stream, config["STREAM_CONSUMER_GROUP"], *gone)
+        live = [(msg_id, fields) for msg_id, fields in messages if fields]
+        if live and not _try_ingest(app, r, stream, live):
+            return  # still failing; the periodic reclaim takes over
+
+
+def _reclaim(app: Flask, r: redis.Redis, stream: str, consumer: str) -> None:
+    """Claim idle PEL entries of ``stream`` and retry them, dead-lettering exhausted ones."""
+    config = app.config
+    group = config["STREAM_CONSUMER_GROUP"]
+    idle_ms = config["STREAM_RECLAIM_IDLE_MS"]
+    start = "-"
+    try:
+        while True:
+            pending = r.xpending_range(
+                stream, group, min=start, max="+", count=config["STREAM_BATCH_SIZE"], idle=idle_ms
+            )
+            if not pending:
+                return
+            start = "(" + pending[-1]["message_id"]
+            deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+            # XCLAIM re-checks the idle time, so two claimers never take the same entry.
+            claimed = [
+                (msg_id, fields)
+                for msg_id, fields in r.xclaim(stream, group, consumer, idle_ms, list(deliveries))
+                if msg_id and fields
+            ]
+            exhausted = [
+                (msg_id, fields, f"not ingested after {deliveries[msg_id]} deliveries")
+                for msg_id, fields in claimed
+                if deliveries[msg_id] >= config["STREAM_MAX_DELIVERIES"]
+            ]
+            if exhausted:
+                _dead_letter(config, r, stream, exhausted, deliveries)
+                log.error("Dead-lettered %d exhausted entries from '%s'", len(exhausted), stream)
+            retry = [
+                (msg_id, fields)
+                for msg_id, fields in claimed
+                if deliveries[msg_id] < config["STREAM_MAX_DELIVERIES"]
+            ]
+            if retry:
+                log.warning("Reclaimed %d idle entries from '%s'", len(retry), stream)
+                if not _try_ingest(app, r, stream, retry):
+                    return
+            if len(pending) < config["STREAM_BATCH_SIZE"]:
+                return
+    except redis.exceptions.RedisError as exc:
+        log.error("Reclaim pass on '%s' failed: %s", stream, exc)
+
+
+def _dead_letter(
+    config, r: redis.Redis, stream: str, rejected: List[Tuple[str, dict, str]],
+    deliveries: Dict[str, int] | None = None, ack_ids: List[str] | None = None,
+) -> None:
+    """Move ``(id, fields, reason)`` entries to the DLQ and ack them (or ``ack_ids``) in one pipeline."""
+    pipe = r.pipeline()
+    failed_at = datetime.now(timezone.utc).isoformat()
+    for msg_id, fields, reason in rejected:
+        pipe.xadd(config["STREAM_DLQ"], {
+            "payload": fields.get("payload", ""),
+            "source_stream": stream,
+            "source_id": msg_id,
+            "error": reason,
+            "deliveries": (deliveries or {}).get(msg_id, 1),
+            "failed_at": failed_at,
+        })
+    pipe.xack(
+        stream,
+        config["STREAM_CONSUMER_GROUP"],
+        *(ack_ids if ack_ids is not None else [msg_id for msg_id, _f, _r in rejected]),
+    )
+    pipe.execute()
+
+
+def _ingest_messages(
+    app: Flask, r: redis.Redis, stream: str, messages: List[Tuple[str, dict]]
+) -> None:
+    config = app.config
+    ids = [msg_id for msg_id, _fields in messages]
+    payloads: List[object] = []
+    rejected: List[Tuple[str, dict, str]] = []
+    for msg_id, fields in messages:
+        try:
+            payloads.append(json.loads(fields.get("payload", "{}")))
+        except ValueError as exc:
+            rejected.append((msg_id, fields, f"malformed payload: {exc}"))
+            payloads.append(None)
+
+    with app.app_context():
+        try:
+            _accepted, errors = _ingest_batch(payloads)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+    for error in errors:
+        msg_id, fields = messages[error["index"]]
+        if payloads[error["index"]] is not None:
+            rejected.append((msg_id, fields, error["error"]))
+
+    _dead_letter(config, r, stream, rejected, ack_ids=ids)
@@ -0,0 +1,91 @@
+"""Periodic in-process sweep of expired monitoring windows.
+
+The same loop also runs the ``heartbeat_events`` retention purge every
+``RETENTION_INTERVAL_SECONDS`` when ``RETENTION_ENABLED`` is set. A purge pass
+is capped at ``RETENTION_MAX_CHUNKS`` chunks; while a backlog remains the next
+pass runs on the following tick, right after that tick's sweep, so the leader
+lock is never held by the purge for long.
+
+Every monitor replica starts this loop, but only the current leader sweeps:
+on MySQL the leader is whoever obtains the named ``GET_LOCK`` for the tick
+(the lock lives on a dedicated connection and is released right after the
+sweep), so several replicas never close the same windows twice. SQLite has a
+single writer and is always its own leader.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable
+
+from flask import Flask
+from sqlalchemy import text
+
+from monitor.modelos import db
+from monitor.retention import purge_expired_heartbeats
+from monitor.routes import _sweep_expired_windows
+
+log = logging.getLogger(__name__)
+
+
+def start_sweeper(app: Flask) -> threading.Thread:
+    """Start the sweep loop in a daemon thread bound to ``app``."""
+    thread = threading.Thread(target=_run, args=(app,), name="window-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+def _run(app: Flask) -> None:
+    config = app.config
+    interval = config["SWEEP_INTERVAL_SECONDS"]
+    lock_name = config["SWEEPER_LOCK_NAME"]
+    next_purge = time.monotonic() if config["RETENTION_ENABLED"] else None
+    log.info("Sweeping expired windows every %ss", interval)
+    while True:
+        started = time.monotonic()
+        with app.app_context():
+            _run_task("Window sweep", lock_name, _sweep)
+            if next_purge is not None and started >= next_purge:
+                report = _run_task("Heartbeat retention", lock_name, purge_expired_heartbeats)
+                if report is not None and not report["complete"]:
+                    next_purge = started  # backlog left: continue on the next tick
+                else:
+                    next_purge = started + config["RETENTION_INTERVAL_SECONDS"]
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def _run_task(label: str, lock_name: str, task: Callable[[], dict]) -> dict | None:
+    try:
+        return run_if_leader(lock_name, task)
+    except Exception:
+        db.session.rollback()
+        log.exception("%s failed", label)
+        return None
+    finally:
+        db.session.remove()
+
+
+def run_if_leader(lock_name: str, task: Callable[[], dict]) -> dict | None:
+    """Run ``task`` if this replica wins ``lock_name``; None when another replica holds it."""
+    if db.engine.dialect.name != "mysql":
+        return task()
+
+    with db.engine.connect() as conn:
+        if not conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": lock_name}).scalar():
+            return None
+        try:
+            return task()
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": lock_name})
+
+
+def _sweep() -> dict:
+    summary = _sweep_expired_windows()
+    if summary["closed"]:
+        log.info(
+            "Closed %d windows (%d alerts, %d missing reports)",
+            summary["closed"], summary["alerts"], summary["missing_reports"],
+        )
+    return summary
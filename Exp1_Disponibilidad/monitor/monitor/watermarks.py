@@ -0,0 +1,91 @@
+"""Per-service event-time clock for ``SWEEP_CLOCK=heartbeat``.
+
+Simulated payments traffic carries timestamps that lag the monitor's wall
+clock (up to ``SIMULATION_BACKFILL_SECONDS``), so comparing ``window_to`` with
+``utcnow()`` would close every window before its heartbeats arrive. In
+heartbeat mode ingestion keeps ``service_watermarks`` at the latest
+``report_timestamp`` seen per service, and a window only expires once its
+service has reported its last expected tick
+(``window_from + (expected_reports - 1) * HEARTBEAT_INTERVAL_SECONDS``).
+Producers publish each service in tick order, so by then every tick of the
+window has been delivered. A service that goes silent is caught by the wall
+clock instead: once nothing was ingested from it for
+``SWEEP_WATERMARK_MAX_LAG_SECONDS``, its windows expire as soon as
+``window_to`` has passed.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from flask import current_app
+from sqlalchemy import and_, or_, select
+
+from monitor.modelos import ServiceWatermark, db, utcnow
+
+from .dialects import add_seconds, greatest, upsert
+
+
+def event_time_enabled() -> bool:
+    return current_app.config.get("SWEEP_CLOCK", "wall") == "heartbeat"
+
+
+def max_lag() -> timedelta:
+    return timedelta(seconds=int(current_app.config["SWEEP_WATERMARK_MAX_LAG_SECONDS"]))
+
+
+def advance_watermarks(rows: Iterable[Dict[str, object]]) -> None:
+    """Move each service's watermark forward to its newest ``report_timestamp`` in ``rows``."""
+    if not event_time_enabled():
+        return
+    latest: Dict[str, datetime] = {}
+    for row in rows:
+        service = row["service_name"]
+        if service not in latest or row["report_timestamp"] > latest[service]:
+            latest[service] = row["report_timestamp"]
+    if not latest:
+        return
+
+    table = ServiceWatermark.__table__
+    now = utcnow()
+    db.session.execute(
+        upsert(
+            table,
+            ["service_name"],
+            lambda incoming: {
+                "watermark": greatest(table.c.watermark, incoming.watermark),
+                "updated_at": incoming.updated_at,
+            },
+        ),
+        # Sorted so concurrent batches lock the rows in the same order.
+        [
+            {"service_name": service, "watermark": latest[service], "updated_at": now}
+            for service in sorted(latest)
+        ],
+    )
+
+
+def expired(windows_table, now: datetime):
+    """SQL condition for windows that are over on the configured clock."""
+    if not event_time_enabled():
+        return windows_table.c.window_to <= now
+
+    def service_column(column):
+        return (
+            select(column)
+            .where(ServiceWatermark.service_name == windows_table.c.service_name)
+            .scalar_subquery()
+        )
+
+    interval = int(current_app.config["HEARTBEAT_INTERVAL_SECONDS"])
+    last_tick = add_seconds(
+        windows_table.c.window_from, (windows_table.c.expected_reports - 1) * interval
+    )
+    return or_(
+        last_tick <= service_column(ServiceWatermark.watermark),
+        and_(
+            windows_table.c.window_to <= now,
+            service_column(ServiceWatermark.updated_at) <= now - max_lag(),
+        ),
+    )
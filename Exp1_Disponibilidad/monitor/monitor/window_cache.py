@@ -0,0 +1,103 @@
+"""Bounded in-process cache of monitoring-window identities.
+
+A window receives a handful of heartbeats during its short life and its id,
+boundaries and expected report count never change, so ingestion resolves
+``window_uuid`` from memory instead of querying ``monitoring_windows`` for every
+heartbeat. Entries are dropped least-recently-used first when the cache is full,
+when the sweep closes the window, or once ``window_to`` plus a grace period has
+passed. Counters are never cached: they are always updated in SQL.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from flask import current_app
+
+from monitor.modelos import utcnow
+
+
+@dataclass(frozen=True)
+class CachedWindow:
+    id: int
+    window_uuid: str
+    service_name: str
+    window_from: datetime
+    window_to: datetime
+    expected_reports: int
+    error_status_no_reportado: float | None
+    error_status_generado: float | None
+
+    @classmethod
+    def from_row(cls, row: object) -> "CachedWindow":
+        return cls(**{field: getattr(row, field) for field in cls.__dataclass_fields__})
+
+
+class WindowCache:
+    """Thread-safe LRU + TTL map of ``window_uuid`` to :class:`CachedWindow`."""
+
+    def __init__(self, max_entries: int, grace_seconds: int) -> None:
+        self.max_entries = max_entries
+        self.grace = timedelta(seconds=grace_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CachedWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, window_uuid: str) -> CachedWindow | None:
+        with self._lock:
+            entry = self._entries.get(window_uuid)
+            if entry is not None and self._expired(entry, utcnow()):
+                del self._entries[window_uuid]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(window_uuid)
+            self.hits += 1
+            return entry
+
+    def put(self, entry: CachedWindow) -> None:
+        if self.max_entries <= 0 or self._expired(entry, utcnow()):
+            return
+        with self._lock:
+            self._entries[entry.window_uuid] = entry
+            self._entries.move_to_end(entry.window_uuid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, window_uuids: Iterable[str]) -> None:
+        with self._lock:
+            for window_uuid in window_uuids:
+                if self._entries.pop(window_uuid, None) is not None:
+                    self.evictions += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def _expired(self, entry: CachedWindow, now: datetime) -> bool:
+        window_to = entry.window_to
+        if window_to.tzinfo is None:
+            # SQLite drops the offset; stored values are always UTC.
+            now = now.replace(tzinfo=None)
+        return window_to + self.grace <= now
+
+
+def window_cache() -> WindowCache:
+    return current_app.extensions["window_cache"]
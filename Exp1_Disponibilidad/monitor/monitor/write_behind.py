@@ -0,0 +1,137 @@
+"""Write-behind buffer for single-heartbeat ingestion (WRITE_BEHIND_ENABLED).
+
+``POST /heartbeats`` validates the payload, hands it to :meth:`offer` and answers
+202 without touching the database. A flusher thread writes whatever accumulated
+every ``WRITE_BEHIND_FLUSH_MS`` or ``WRITE_BEHIND_FLUSH_RECORDS`` heartbeats,
+whichever comes first, in one transaction through the set-based batch path
+(one multi-row INSERT plus one aggregated counter UPDATE per window). When the
+buffer is full ``offer`` refuses the heartbeat and the route answers 503 so the
+caller backs off. A flush that fails (e.g. the database is down) is not dropped:
+the same batch is retried with exponential back-off (capped at
+``RETRY_MAX_DELAY_S``) while new heartbeats keep queueing, so during an outage
+the buffer fills up and the 503 back-pressure takes over. On shutdown the buffer
+stops accepting and is drained.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import signal
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from flask import Flask
+
+from monitor.modelos import db
+from monitor.routes import _store_batch
+from monitor.window_cache import window_cache
+
+log = logging.getLogger(__name__)
+
+RETRY_MAX_DELAY_S = 30.0
+
+
+class WriteBehindBuffer:
+    def __init__(self, app: Flask, max_size: int, flush_ms: int, flush_records: int) -> None:
+        self._app = app
+        self._queue: "queue.Queue[Dict[str, object]]" = queue.Queue(maxsize=max_size)
+        self._flush_s = flush_ms / 1000
+        self._flush_records = flush_records
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._held: List[Dict[str, object]] = []
+        self.flushed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self) -> "WriteBehindBuffer":
+        self._thread.start()
+        atexit.register(self.stop)
+        if threading.current_thread() is threading.main_thread():
+            # Turn `docker stop` into a normal interpreter exit so atexit drains the buffer.
+            signal.signal(signal.SIGTERM, lambda *_args: sys.exit(0))
+        return self
+
+    def offer(self, data: Dict[str, object]) -> bool:
+        if self._stopping.is_set():
+            return False
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        return True
+
+    def stop(self, timeout_s: float = 30) -> None:
+        """Stop accepting heartbeats and wait for the flusher to write the rest."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout_s)
+        unwritten = self._queue.qsize() + len(self._held)
+        if unwritten:
+            log.error("Shutdown with %d buffered heartbeats not written", unwritten)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": self._queue.qsize(),
+            "retrying": len(self._held),
+            "capacity": self._queue.maxsize,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+    def _run(self) -> None:
+        attempt = 0
+        while True:
+            if not self._held:
+                self._held = self._take()
+                if not self._held:
+                    if self._stopping.is_set():
+                        return
+                    continue
+            if self._flush(self._held):
+                self._held, attempt = [], 0
+                continue
+            # Keep the batch: it was already answered with 202.
+            delay = min(self._flush_s * 2 ** attempt, RETRY_MAX_DELAY_S)
+            attempt += 1
+            time.sleep(delay)
+
+    def _take(self) -> List[Dict[str, object]]:
+        """Block for the first heartbeat, then collect until the size or time limit."""
+        batch: List[Dict[str, object]] = []
+        deadline = None
+        while len(batch) < self._flush_records:
+            timeout = self._flush_s if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self._flush_s
+        return batch
+
+    def _flush(self, batch: List[Dict[str, object]]) -> bool:
+        with self._app.app_context():
+            try:
+                _store_batch(batch)
+                db.session.commit()
+                self.flushed += len(batch)
+                return True
+            except Exception:
+                db.session.rollback()
+                # Windows created in the rolled-back transaction must not be served from cache.
+                window_cache().evict({data["window_uuid"] for data in batch})
+                self.failed += 1
+                log.exception("Failed to flush %d buffered heartbeats, will retry", len(batch))
+                return False
+            finally:
+                db.session.remove()
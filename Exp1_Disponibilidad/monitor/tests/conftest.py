@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+# Same entry point as app.py, which runs from the service directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import config  # noqa: E402
+from __init__ import create_app  # noqa: E402
+from monitor.modelos import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """The testing app on a SQLite file, so several threads see the same database."""
+    file_config = type(
+        "FileTestingConfig",
+        (config.TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'monitor.db'}"},
+    )
+    monkeypatch.setitem(config.config_by_name, "testing-file", file_config)
+    app = create_app("testing-file")
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_window():
+    """Window identity fields for a window of ``duration_s`` seconds starting ``start_ago_s`` ago."""
+
+    def factory(start_ago_s: int = 0, duration_s: int = 60, service: str = "payments-a") -> dict:
+        window_from = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(seconds=start_ago_s)
+        return {
+            "service": service,
+            "window_uuid": str(uuid4()),
+            "window_from": window_from.isoformat(),
+            "window_to": (window_from + timedelta(seconds=duration_s)).isoformat(),
+        }
+
+    return factory
+
+
+def heartbeat(window: dict, tick: int, status: str = "OK", interval_s: int = 10) -> dict:
+    timestamp = datetime.fromisoformat(window["window_from"]) + timedelta(seconds=tick * interval_s)
+    return {**window, "status": status, "timestamp": timestamp.isoformat()}
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+
+from conftest import heartbeat
+from monitor.modelos import HeartbeatEvent, MonitoringWindow, db
+
+
+def _window(app, window_uuid: str) -> MonitoringWindow:
+    with app.app_context():
+        window = MonitoringWindow.query.filter_by(window_uuid=window_uuid).one()
+        db.session.expunge(window)
+        return window
+
+
+def test_single_heartbeats_increment_window_counters(app, client, make_window) -> None:
+    window = make_window()
+
+    for tick, status in enumerate(["OK", "error: timeout", "OK"]):
+        response = client.post("/api/monitor/heartbeats", json=heartbeat(window, tick, status))
+        assert response.status_code == 202
+
+    body = response.get_json()["window"]
+    assert body["expected_reports"] == 6
+    assert body["received_reports"] == 3
+    assert body["error_reports"] == 1
+    assert body["status"] == "open"
+
+
+def test_batch_aggregates_counters_per_window_and_reports_rejections(app, client, make_window) -> None:
+    first, second = make_window(), make_window(service="payments-b")
+    items = [
+        heartbeat(first, 0),
+        heartbeat(first, 1, "error: declined"),
+        {**heartbeat(second, 0), "status": "maybe"},
+        heartbeat(second, 0),
+        heartbeat(first, 2),
+    ]
+
+    response = client.post("/api/monitor/heartbeats/batch", json=items)
+
+    assert response.status_code == 202
+    summary = response.get_json()
+    assert summary["accepted"] == 4
+    assert summary["rejected"] == 1
+    assert summary["errors"][0]["index"] == 2
+
+    stored_first, stored_second = _window(app, first["window_uuid"]), _window(app, second["window_uuid"])
+    assert (stored_first.received_reports, stored_first.error_reports) == (3, 1)
+    assert (stored_second.received_reports, stored_second.error_reports) == (1, 0)
+    with app.app_context():
+        assert HeartbeatEvent.query.count() == 4
+
+
+def test_concurrent_heartbeats_do_not_lose_counts(file_app, make_window) -> None:
+    window = make_window(duration_s=600)
+    first = file_app.test_client().post("/api/monitor/heartbeats", json=heartbeat(window, 0))
+    assert first.status_code == 202
+
+    threads_n, per_thread = 4, 10
+    failures = []
+
+    def send(offset: int) -> None:
+        client = file_app.test_client()
+        for i in range(per_thread):
+            tick = 1 + offset * per_thread + i
+            status = "error: boom" if tick % 5 == 0 else "OK"
+            response = client.post("/api/monitor/heartbeats", json=heartbeat(window, tick, status))
+            if response.status_code != 202:
+                failures.append(response.status_code)
+
+    threads = [threading.Thread(target=send, args=(n,)) for n in range(threads_n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    stored = _window(file_app, window["window_uuid"])
+    assert stored.received_reports == 1 + threads_n * per_thread
+    assert stored.error_reports == threads_n * per_thread // 5
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from monitor.gap_detector import GapDetector
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _window(service: str = "payments-a", duration_s: int = 60) -> SimpleNamespace:
+    return SimpleNamespace(
+        window_uuid=f"{service}-w", service_name=service,
+        window_from=T0, window_to=T0 + timedelta(seconds=duration_s),
+    )
+
+
+def _at(seconds: float) -> datetime:
+    return T0 + timedelta(seconds=seconds)
+
+
+def test_overdue_tick_flags_the_window_once() -> None:
+    detector = GapDetector(interval_seconds=10, grace_seconds=2)
+    window = _window()
+    detector.observe(window, _at(0))
+
+    assert detector.check(_at(11)) == 0  # tick 1 still within the grace period
+    assert detector.check(_at(12)) == 1
+    assert detector.check(_at(22)) == 0  # tick 2 missed too, already flagged
+
+    schedule = detector._windows[window.window_uuid]
+    assert schedule.missed_ticks == 2
+    assert schedule.degraded_since == _at(12)
+    assert detector.flagged_total == 1
+
+
+def test_later_heartbeat_clears_the_flag_but_keeps_missed_ticks() -> None:
+    detector = GapDetector(interval_seconds=10, grace_seconds=2)
+    window = _window()
+    detector.observe(window, _at(0))
+    detector.check(_at(12))
+
+    detector.observe(window, _at(20))
+
+    schedule = detector._windows[window.window_uuid]
+    assert schedule.degraded_since is None
+    assert schedule.missed_ticks == 1
+    assert detector.check(_at(31)) == 0  # the old tick-1 deadline was superseded
+
+
+def test_duplicate_and_late_heartbeats_do_not_move_the_deadline() -> None:
+    detector = GapDetector(interval_seconds=10, grace_seconds=2)
+    window = _window()
+    detector.observe(window, _at(10))
+    detector.observe(window, _at(10))
+    detector.observe(window, _at(0))
+
+    assert detector._windows[window.window_uuid].next_tick == 2
+    assert detector.check(_at(22)) == 1
+
+
+def test_windows_past_their_end_are_dropped() -> None:
+    detector = GapDetector(interval_seconds=10, grace_seconds=2)
+    window = _window(duration_s=20)
+    detector.observe(window, _at(20))  # last tick of the window
+
+    detector.check(_at(31))
+    assert window.window_uuid in detector._windows
+    detector.check(_at(32))
+    assert window.window_uuid not in detector._windows
+
+
+def test_event_time_waits_for_the_service_clock_until_it_goes_silent() -> None:
+    detector = GapDetector(interval_seconds=10, grace_seconds=2, event_time=True, max_lag_seconds=30)
+    window = _window()
+    detector.observe(window, _at(0))
+    heard_at = detector._heard_at[window.service_name]
+
+    # Wall time is far ahead of the simulated traffic, but the service is still reporting.
+    assert detector.check(heard_at + timedelta(seconds=29)) == 0
+    assert detector.check(heard_at + timedelta(seconds=30)) == 1
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import heartbeat
+from monitor.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip() -> None:
+    value = datetime(2026, 1, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+
+    assert decode_cursor(encode_cursor(value, 42)) == (value, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm90IGpzb24=", "WzFd", "WyJ5ZXN0ZXJkYXkiLCAxXQ=="])
+def test_malformed_cursor_raises_value_error(cursor) -> None:
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_timestamp_ties_without_gaps_or_duplicates(client, make_window) -> None:
+    window = make_window()
+    # Two heartbeats per tick, so page boundaries fall inside runs of equal timestamps.
+    items = [heartbeat(window, tick, status) for tick in range(3) for status in ("OK", "error: boom")]
+    assert client.post("/api/monitor/heartbeats/batch", json=items).get_json()["accepted"] == 6
+    url = f"/api/monitor/windows/{window['window_uuid']}/heartbeats?limit=4"
+
+    first = client.get(url).get_json()
+    assert len(first["heartbeats"]) == 4
+    assert first["next_cursor"] is not None
+    second = client.get(f"{url}&cursor={first['next_cursor']}").get_json()
+    assert len(second["heartbeats"]) == 2
+    assert second["next_cursor"] is None
+
+    ids = [row["id"] for row in first["heartbeats"] + second["heartbeats"]]
+    everything = client.get(f"/api/monitor/windows/{window['window_uuid']}/heartbeats").get_json()
+    assert ids == [row["id"] for row in everything["heartbeats"]]
+    assert len(set(ids)) == 6
+
+
+def test_exact_last_page_has_no_next_cursor(client, make_window) -> None:
+    window = make_window()
+    client.post("/api/monitor/heartbeats/batch", json=[heartbeat(window, tick) for tick in range(2)])
+
+    page = client.get(f"/api/monitor/windows/{window['window_uuid']}/heartbeats?limit=2").get_json()
+
+    assert len(page["heartbeats"]) == 2
+    assert page["next_cursor"] is None
+
+
+def test_bad_cursor_is_rejected(client, make_window) -> None:
+    window = make_window()
+    client.post("/api/monitor/heartbeats", json=heartbeat(window, 0))
+
+    response = client.get(f"/api/monitor/windows/{window['window_uuid']}/heartbeats?cursor=garbage")
+
+    assert response.status_code == 400
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from conftest import heartbeat
+from monitor.modelos import HeartbeatEvent, MonitoringWindow, RetentionCursor, db, utcnow
+from monitor.retention import purge_expired_heartbeats
+
+
+def _closed_window(app, client, make_window, closed_ago_h: float, ticks: int = 3) -> int:
+    window = make_window()
+    client.post("/api/monitor/heartbeats/batch", json=[heartbeat(window, tick) for tick in range(ticks)])
+    with app.app_context():
+        stored = MonitoringWindow.query.filter_by(window_uuid=window["window_uuid"]).one()
+        stored.mark_closed()
+        stored.closed_at = utcnow() - timedelta(hours=closed_ago_h)
+        db.session.commit()
+        return stored.id
+
+
+def _heartbeats(app, window_id: int) -> int:
+    with app.app_context():
+        return HeartbeatEvent.query.filter_by(window_id=window_id).count()
+
+
+def _cursor(app):
+    with app.app_context():
+        return db.session.get(RetentionCursor, "heartbeat_events")
+
+
+def test_complete_pass_advances_the_cursor(app, client, make_window) -> None:
+    old = _closed_window(app, client, make_window, closed_ago_h=3)
+    recent = _closed_window(app, client, make_window, closed_ago_h=0.5)
+
+    with app.app_context():
+        report = purge_expired_heartbeats(timedelta(hours=1), chunk_size=2)
+
+    assert (report["deleted_heartbeats"], report["chunks"], report["complete"]) == (3, 2, True)
+    assert (_heartbeats(app, old), _heartbeats(app, recent)) == (0, 3)
+    assert _cursor(app).purged_before is not None
+
+
+def test_next_pass_only_scans_windows_closed_since_the_cursor(app, client, make_window) -> None:
+    with app.app_context():
+        purge_expired_heartbeats(timedelta(hours=1))
+    # Closed before the stored cutoff (e.g. a late close); below the cursor, so skipped.
+    behind = _closed_window(app, client, make_window, closed_ago_h=3)
+
+    with app.app_context():
+        report = purge_expired_heartbeats(timedelta(hours=1))
+
+    assert report["deleted_heartbeats"] == 0
+    assert _heartbeats(app, behind) == 3
+
+
+def test_incomplete_pass_keeps_the_cursor(app, client, make_window) -> None:
+    window_id = _closed_window(app, client, make_window, closed_ago_h=3, ticks=5)
+
+    with app.app_context():
+        report = purge_expired_heartbeats(timedelta(hours=1), chunk_size=2, max_chunks=1)
+
+    assert (report["deleted_heartbeats"], report["complete"]) == (2, False)
+    assert _cursor(app) is None
+
+    with app.app_context():
+        report = purge_expired_heartbeats(timedelta(hours=1), chunk_size=2, max_chunks=0)
+
+    assert (report["deleted_heartbeats"], report["complete"]) == (3, True)
+    assert _heartbeats(app, window_id) == 0
+    assert _cursor(app) is not None
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from conftest import heartbeat
+from monitor.modelos import HeartbeatEvent, HeartbeatStatus, MonitoringWindow, WindowState
+
+
+def _send(client, window: dict, statuses) -> None:
+    response = client.post(
+        "/api/monitor/heartbeats/batch",
+        json=[heartbeat(window, tick, status) for tick, status in enumerate(statuses)],
+    )
+    assert response.get_json()["rejected"] == 0
+
+
+def test_sweep_fills_missing_reports_and_raises_alert(app, client, make_window) -> None:
+    window = make_window(start_ago_s=70, duration_s=60)  # 6 ticks, ended 10 s ago
+    _send(client, window, ["OK", "error: declined", "OK", "OK"])
+
+    summary = client.post("/api/monitor/windows/sweep").get_json()
+
+    assert summary["closed"] == 1
+    assert summary["alerts"] == 1
+    assert summary["missing_reports"] == 2
+    with app.app_context():
+        stored = MonitoringWindow.query.filter_by(window_uuid=window["window_uuid"]).one()
+        assert stored.status == WindowState.ALERT
+        assert stored.expected_reports == 6
+        assert stored.missing_reports == 2
+        # Missing ticks count as received errors once the window is closed.
+        assert stored.received_reports == 6
+        assert stored.error_reports == 3
+        assert stored.closed_at is not None
+        missing = HeartbeatEvent.query.filter_by(window_id=stored.id, status=HeartbeatStatus.MISSING).count()
+        assert missing == 2
+
+
+def test_sweep_closes_complete_window_without_alert(app, client, make_window) -> None:
+    window = make_window(start_ago_s=70, duration_s=60)
+    _send(client, window, ["OK"] * 6)
+
+    summary = client.post("/api/monitor/windows/sweep").get_json()
+
+    assert (summary["closed"], summary["alerts"], summary["missing_reports"]) == (1, 0, 0)
+    with app.app_context():
+        stored = MonitoringWindow.query.filter_by(window_uuid=window["window_uuid"]).one()
+        assert stored.status == WindowState.CLOSED
+        assert (stored.received_reports, stored.error_reports, stored.missing_reports) == (6, 0, 0)
+
+
+def test_sweep_leaves_open_windows_alone(app, client, make_window) -> None:
+    window = make_window(start_ago_s=0, duration_s=60)
+    _send(client, window, ["OK"])
+
+    summary = client.post("/api/monitor/windows/sweep").get_json()
+
+    assert summary["closed"] == 0
+    with app.app_context():
+        stored = MonitoringWindow.query.filter_by(window_uuid=window["window_uuid"]).one()
+        assert stored.status == WindowState.OPEN
+        assert stored.missing_reports == 0
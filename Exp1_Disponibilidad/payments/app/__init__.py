@@ -2,7 +2,10 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
+from .sql_metrics import SQLMetrics
+
 db = SQLAlchemy()
+sql_metrics = SQLMetrics()
 
 def create_app():
     app = Flask(__name__)
@@ -10,11 +13,21 @@ def create_app():
     app.config["SERVICE_NAME"] = os.environ["SERVICE_NAME"]
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.init_app(app)
+    with app.app_context():
+        sql_metrics.instrument_engine(db.engine)
+    sql_metrics.init_app(app)
 
     from .routes import bp
     app.register_blueprint(bp)
 
     with app.app_context():
         db.metadata.create_all(bind=db.engine, checkfirst=True)
+        # create_all no agrega índices a tablas existentes
+        from .stats import AUDIT_STATS_INDEX
+        AUDIT_STATS_INDEX.create(bind=db.engine, checkfirst=True)
+
+    if os.getenv("RESUME_WINDOWS", "true").lower() == "true":
+        from .runner import resume_windows
+        resume_windows(app)
 
     return app
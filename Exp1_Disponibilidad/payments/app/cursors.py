@@ -0,0 +1,53 @@
+from sqlalchemy import bindparam, delete, update
+
+from . import db
+
+# Plan de slots serializado a un carácter por tick
+_SLOT_CODES = {"ok": "O", "error": "E", "no_reported": "N"}
+_CODE_SLOTS = {code: slot for slot, code in _SLOT_CODES.items()}
+
+
+class WindowCursor(db.Model):
+    """
+    Progreso persistido de una ventana activa: el plan de slots ya barajado y el
+    índice del próximo tick. Se crea al programar la ventana, avanza en la misma
+    transacción que la auditoría de cada tick y se borra al emitir el último, así
+    que las filas que quedan son exactamente las ventanas sin terminar.
+    """
+
+    __tablename__ = "report_window_cursors"
+
+    window_uuid = db.Column(db.String(36), primary_key=True)
+    service     = db.Column(db.String(100), nullable=False, index=True)
+    next_index  = db.Column(db.Integer, nullable=False, default=0)
+    slot_plan   = db.Column(db.Text, nullable=False)
+
+
+def encode_plan(slots):
+    return "".join(_SLOT_CODES[slot] for slot in slots)
+
+def decode_plan(plan):
+    return [_CODE_SLOTS[code] for code in plan]
+
+def cursor_row(run):
+    return {
+        "window_uuid": run.window_uuid,
+        "service":     run.service,
+        "next_index":  run.index,
+        "slot_plan":   encode_plan(run.slots),
+    }
+
+def advance_cursors(runs):
+    """Guarda el nuevo índice de las ventanas que siguen y borra las terminadas (sin commit)."""
+    table = WindowCursor.__table__
+    ongoing  = [run for run in runs if run.index < len(run.slots)]
+    finished = [run.window_uuid for run in runs if run.index >= len(run.slots)]
+    if ongoing:
+        db.session.execute(
+            update(table)
+            .where(table.c.window_uuid == bindparam("w_uuid"))
+            .values(next_index=bindparam("idx")),
+            [{"w_uuid": run.window_uuid, "idx": run.index} for run in ongoing],
+        )
+    if finished:
+        db.session.execute(delete(table).where(table.c.window_uuid.in_(finished)))
@@ -1,15 +1,36 @@
 import os
 import random
+from types import SimpleNamespace
 from uuid import uuid4
-from datetime import datetime, timezone, timedelta
+from datetime import timedelta
 from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import insert
 
 from . import db
-from .models import ReportWindow, ReportAudit
-from .runner import start_window_async
+from .models import ReportWindow
+from .runner import CLOCK, build_slots, schedule_windows
+from .stats import MAX_BULK_UUIDS, window_stats_many
 
 bp = Blueprint("payments", __name__)
 
+BULK_MAX_WINDOWS = int(os.getenv("BULK_MAX_WINDOWS", 10000))
+
+# Distribuciones por defecto (las mismas de POST /report-windows)
+DEFAULT_DISTRIBUTIONS = {
+    "error_status_generado":     {"min": 0.0, "max": 0.30},
+    "error_status_no_reportado": {"min": 0.0, "max": 0.15},
+    "duration_sec":              {"min": 60,  "max": 180},
+    "start_spread_sec":          {"min": 0,   "max": 0},
+}
+
+def snap_to_tick(dt):
+    # Snap to the next 10-second boundary, drop sub-second precision
+    dt = dt.replace(microsecond=0)
+    remainder = dt.second % 10
+    if remainder != 0:
+        dt = dt + timedelta(seconds=(10 - remainder))
+    return dt
+
 @bp.get("/health")
 def health():
     return {"ok": True, "service": os.getenv("SERVICE_NAME", "payments-1")}
@@ -21,11 +42,7 @@ def create_window():
     err_norep    = round(random.uniform(0.0, 0.15), 4)   # 0%..15%
     duration_sec = random.randint(60, 180)               # 1..3 min
 
-    # Snap to the next 10-second boundary, drop sub-second precision
-    now = datetime.now(timezone.utc).replace(microsecond=0)
-    remainder = now.second % 10
-    if remainder != 0:
-        now = now + timedelta(seconds=(10 - remainder))
+    now = snap_to_tick(CLOCK.now())
 
     w_uuid = str(uuid4())
 
@@ -40,8 +57,8 @@ def create_window():
     db.session.add(w)
     db.session.commit()
 
-    # Arranca en background (sin worker)
-    start_window_async(w_uuid)
+    # La registra en el scheduler del proceso (sin worker)
+    schedule_windows([w_uuid])
 
     return jsonify({
         "ok": True,
@@ -55,23 +72,79 @@ def create_window():
         "tick_seconds": 10,
     }), 202
 
+@bp.post("/report-windows/bulk")
+def create_windows_bulk():
+    """
+    Crea `count` ventanas en una sola transacción y las registra juntas en el
+    scheduler. Con el mismo `seed` se repiten los parámetros y el plan de slots
+    de la ventana i (sembrado con `seed` e `i`), para comparar builds con
+    tráfico idéntico; los uuids son siempre nuevos, así que el mismo seed puede
+    usarse en otro servicio o repetirse sobre la misma base.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        count = int(body.get("count", 0))
+        seed = body.get("seed")
+        if seed is not None and not isinstance(seed, (int, str)):
+            raise ValueError("seed must be an integer or a string")
+        dists = {}
+        for name, default in DEFAULT_DISTRIBUTIONS.items():
+            dist = {**default, **(body.get(name) or {})}
+            low, high = float(dist["min"]), float(dist["max"])
+            if low > high:
+                raise ValueError(f"{name}: min must be <= max")
+            dists[name] = (low, high)
+    except (TypeError, ValueError, AttributeError) as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    if not 1 <= count <= BULK_MAX_WINDOWS:
+        return jsonify({"ok": False, "error": f"count must be between 1 and {BULK_MAX_WINDOWS}"}), 400
+
+    rng = random.Random(seed)
+    service = current_app.config["SERVICE_NAME"]
+    start = snap_to_tick(CLOCK.now())
+
+    rows, plans = [], {}
+    for index in range(count):
+        duration_sec = rng.randint(int(dists["duration_sec"][0]), int(dists["duration_sec"][1]))
+        offset = rng.randint(int(dists["start_spread_sec"][0]), int(dists["start_spread_sec"][1]))
+        window_from = start + timedelta(seconds=offset - offset % 10)
+        rows.append({
+            "window_uuid": str(uuid4()),
+            "service": service,
+            "error_status_generado": round(rng.uniform(*dists["error_status_generado"]), 4),
+            "error_status_no_reportado": round(rng.uniform(*dists["error_status_no_reportado"]), 4),
+            "window_from": window_from,
+            "window_to": window_from + timedelta(seconds=duration_sec),
+        })
+        plan_rng = random.Random(f"{seed}:{index}") if seed is not None else rng
+        plans[rows[-1]["window_uuid"]] = build_slots(SimpleNamespace(**rows[-1]), plan_rng)
+
+    db.session.execute(insert(ReportWindow), rows)
+    db.session.commit()
+
+    uuids = [row["window_uuid"] for row in rows]
+    schedule_windows(uuids, plans)
+
+    return jsonify({
+        "ok": True,
+        "service": service,
+        "count": count,
+        "seed": seed,
+        "window_from": start.isoformat().replace("+00:00", "Z"),
+        "window_uuids": uuids,
+        "tick_seconds": 10,
+    }), 202
+
 @bp.get("/report-windows/<window_uuid>/stats")
 def window_stats(window_uuid: str):
-    total       = ReportAudit.query.filter_by(window_uuid=window_uuid).count()
-    sent        = ReportAudit.query.filter_by(window_uuid=window_uuid, sent_to_queue=True).count()
-    no_reported = ReportAudit.query.filter_by(window_uuid=window_uuid, status="no_reported").count()
-    ok          = ReportAudit.query.filter_by(window_uuid=window_uuid, status="ok").count()
-    err         = ReportAudit.query.filter(
-        ReportAudit.window_uuid == window_uuid,
-        ReportAudit.status.like("error:%")
-    ).count()
-
-    return {
-        "ok": True,
-        "window_uuid": window_uuid,
-        "audit_total": total,
-        "sent_to_queue": sent,
-        "no_reported": no_reported,
-        "ok_count": ok,
-        "error_count": err,
-    }
+    return window_stats_many([window_uuid])[window_uuid]
+
+@bp.get("/report-windows/stats")
+def window_stats_bulk():
+    uuids = [u.strip() for u in request.args.get("uuids", "").split(",") if u.strip()]
+    if not uuids:
+        return jsonify({"ok": False, "error": "uuids query parameter is required"}), 400
+    if len(uuids) > MAX_BULK_UUIDS:
+        return jsonify({"ok": False, "error": f"at most {MAX_BULK_UUIDS} uuids per request"}), 400
+
+    return jsonify({"ok": True, "windows": window_stats_many(uuids)})
@@ -1,84 +1,381 @@
-import os, json, random, time, threading
+import os, json, random, heapq, itertools, logging, math, threading, time, zlib
 from uuid import uuid4
-from datetime import timezone, timedelta
+from datetime import datetime, timezone, timedelta
+
+from flask import current_app
 from redis import Redis
+from sqlalchemy import insert, select
 
+from . import db
+from .cursors import WindowCursor, advance_cursors, cursor_row, decode_plan
 from .models import ReportWindow, ReportAudit
 
+# Tope aproximado del stream; el trimmer de monitor-queue recorta además por MINID.
+REPORTS_STREAM_MAXLEN = int(os.getenv("REPORTS_STREAM_MAXLEN", 100000))
+# Con REPORTS_STREAM_SHARDS=N cada servicio publica en "reports:{crc32(service) % N}";
+# debe coincidir con STREAM_SHARDS de monitor-queue.
+REPORTS_STREAM        = os.getenv("REPORTS_STREAM", "reports")
+REPORTS_STREAM_SHARDS = int(os.getenv("REPORTS_STREAM_SHARDS", 0))
+TICK_SECONDS = 10
+# Qué hacer con los ticks vencidos al reanudar ventanas tras un reinicio:
+# "replay" los emite con su timestamp original, "skip" los audita como "skipped".
+RESUME_POLICY = os.getenv("RESUME_POLICY", "replay").strip().lower()
+
+log = logging.getLogger(__name__)
+
 def iso_z(dt):
     return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
 
+def as_utc(dt):
+    # MySQL devuelve datetimes naive; siempre están en UTC
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+def stream_for(service):
+    # Un servicio siempre cae en el mismo shard, así conserva su orden
+    if REPORTS_STREAM_SHARDS <= 0:
+        return REPORTS_STREAM
+    return f"{REPORTS_STREAM}:{zlib.crc32(service.encode('utf-8')) % REPORTS_STREAM_SHARDS}"
+
 def get_redis():
     return Redis.from_url(os.environ["REDIS_REPORTS_URL"], decode_responses=True)
 
-def _run_window(window_uuid: str):
-    # Crea un app context independiente para el hilo
-    from app import create_app, db
 
-    app = create_app()
-    r = get_redis()
+class SimulationClock:
+    """
+    Reloj de la simulación (SIMULATION_SPEED).
 
-    with app.app_context():
-        w = db.session.get(ReportWindow, window_uuid)
-        if not w:
+    Con velocidad 1 y sin SIMULATION_START es el reloj real. Con otra velocidad
+    el tiempo virtual arranca en SIMULATION_START (por defecto, hace
+    SIMULATION_BACKFILL_SECONDS) y avanza `speed` veces más rápido; con
+    `max` salta directamente al próximo tick pendiente. Nunca supera la hora
+    real, así que los timestamps sintéticos siempre quedan en el pasado para el
+    monitor, y al alcanzarla la simulación sigue en tiempo real. Por eso el
+    monitor debe correr con SWEEP_CLOCK=heartbeat mientras se simula: con el
+    reloj de pared cerraría las ventanas antes de recibir sus heartbeats.
+    """
+
+    def __init__(self, speed=1.0, start=None):
+        self.speed = speed
+        self._origin_real = time.monotonic()
+        self._origin_virtual = start
+        self._virtual = start
+
+    @classmethod
+    def from_env(cls):
+        raw = os.getenv("SIMULATION_SPEED", "1").strip().lower()
+        speed = math.inf if raw in ("max", "inf", "0") else float(raw)
+        start = os.getenv("SIMULATION_START")
+        if start:
+            start = as_utc(datetime.fromisoformat(start.replace("Z", "+00:00")))
+        elif speed != 1:
+            backfill = int(os.getenv("SIMULATION_BACKFILL_SECONDS", 3600))
+            start = datetime.now(timezone.utc) - timedelta(seconds=backfill)
+        return cls(speed, start)
+
+    @property
+    def simulated(self):
+        return self._origin_virtual is not None
+
+    def now(self):
+        real = datetime.now(timezone.utc)
+        if not self.simulated:
+            return real
+        if math.isinf(self.speed):
+            virtual = self._virtual
+        else:
+            elapsed = (time.monotonic() - self._origin_real) * self.speed
+            virtual = self._origin_virtual + timedelta(seconds=elapsed)
+        return min(virtual, real)
+
+    def wait_seconds(self, until):
+        """Segundos reales a esperar hasta el instante virtual `until`."""
+        real = datetime.now(timezone.utc)
+        if not self.simulated:
+            return max(0.0, (until - real).total_seconds())
+        if math.isinf(self.speed):
+            # Salta al próximo evento, sin pasar de la hora real
+            self._virtual = max(self._virtual, min(until, real))
+            return max(0.0, (until - real).total_seconds())
+        now = self.now()
+        if until <= now:
+            return 0.0
+        if now >= real:
+            return (until - real).total_seconds()
+        return (until - now).total_seconds() / self.speed
+
+
+CLOCK = SimulationClock.from_env()
+if CLOCK.simulated:
+    log.warning(
+        "Simulated clock (SIMULATION_SPEED=%s): the monitor must run with SWEEP_CLOCK=heartbeat",
+        CLOCK.speed,
+    )
+
+
+def build_slots(w, rng=random):
+    # --- Pre-compute deterministic slot schedule ---
+    total_ticks = int((w.window_to - w.window_from).total_seconds() // TICK_SECONDS) + 1
+    n_errors_raw = round(w.error_status_generado * total_ticks)
+    n_omitted    = max(1, round(w.error_status_no_reportado * total_ticks))  # siempre al menos 1 omitido
+
+    # Asegura que quede espacio para el omitido y no se generen negativos
+    n_errors = min(n_errors_raw, max(0, total_ticks - n_omitted))
+    n_ok     = max(0, total_ticks - n_errors - n_omitted)
+
+    slots = ["error"] * n_errors + ["no_reported"] * n_omitted + ["ok"] * n_ok
+    # `rng` sembrado (POST /report-windows/bulk con seed) hace el plan reproducible
+    rng.shuffle(slots)
+    return slots
+
+
+class WindowRun:
+    """Estado de una ventana activa: su plan de slots y el próximo tick a emitir."""
+
+    __slots__ = ("window_uuid", "service", "window_from", "window_to", "slots", "index")
+
+    def __init__(self, w, slots, index=0):
+        self.window_uuid = w.window_uuid
+        self.service     = w.service
+        self.window_from = as_utc(w.window_from)
+        self.window_to   = as_utc(w.window_to)
+        self.slots       = slots
+        self.index       = index
+
+    def tick_at(self):
+        return self.window_from + timedelta(seconds=TICK_SECONDS * self.index)
+
+    def audit_row(self, status, tick, sent):
+        return {
+            "window_uuid":   self.window_uuid,
+            "service":       self.service,
+            "status":        status,
+            "window_from":   self.window_from,
+            "window_to":     self.window_to,
+            "timestamp":     tick,
+            "sent_to_queue": sent,
+        }
+
+    def skip_past_due(self, now):
+        """Avanza sobre los ticks con más de un intervalo de atraso; devuelve su auditoría."""
+        audits = []
+        while self.index < len(self.slots) and self.tick_at() + timedelta(seconds=TICK_SECONDS) <= now:
+            audits.append(self.audit_row("skipped", self.tick_at(), False))
+            self.index += 1
+        return audits
+
+    def next_report(self):
+        """(fila de auditoría, payload o None si el slot se omite) del tick actual."""
+        slot = self.slots[self.index]
+        tick = self.tick_at()
+        if slot == "no_reported":
+            audit_status   = "no_reported"
+            payload_status = "ok"   # no se enviará
+            sent           = False
+        elif slot == "error":
+            payload_status = f"error:simulated_error_{uuid4()}"
+            audit_status   = payload_status
+            sent           = True
+        else:
+            payload_status = "ok"
+            audit_status   = "ok"
+            sent           = True
+
+        audit = self.audit_row(audit_status, tick, sent)
+        payload = {
+            "service":     self.service,
+            "status":      payload_status,
+            "window_uuid": self.window_uuid,
+            "window_from": iso_z(self.window_from),
+            "window_to":   iso_z(self.window_to),
+            "timestamp":   iso_z(tick),
+        } if sent else None
+        return audit, payload
+
+
+class ReportScheduler:
+    """
+    Un único hilo por proceso emite los ticks de todas las ventanas activas.
+
+    Las ventanas viven en un heap ordenado por la hora de su próximo tick. Todos
+    los ticks que vencen a la vez (las ventanas arrancan alineadas a 10 s) se
+    emiten juntos: un INSERT multi-fila de ReportAudit y, solo después del
+    commit, un pipeline de Redis con los XADD. Comparte el app, el pool de la
+    base de datos y el pool de Redis, así que la memoria no crece con el número
+    de ventanas.
+
+    El índice de cada ventana se persiste en WindowCursor dentro de la misma
+    transacción que su auditoría, así que tras un reinicio `resume` retoma cada
+    ventana sin terminar en el tick exacto donde quedó.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._redis = get_redis()
+        self._heap = []
+        self._seq = itertools.count()
+        self._pending = []
+        self._plans = {}
+        self._resume_service = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._loop, name="report-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def add(self, window_uuids, plans=None):
+        """Programa ventanas ya guardadas; `plans` (uuid -> slots) fija planes precalculados."""
+        with self._cond:
+            self._pending.extend(window_uuids)
+            self._plans.update(plans or {})
+            self._cond.notify()
+
+    def resume(self, service):
+        """Retoma desde la base de datos las ventanas sin terminar de `service`."""
+        with self._cond:
+            self._resume_service = service
+            self._cond.notify()
+
+    def active_windows(self):
+        return len(self._heap)
+
+    def _push(self, run):
+        heapq.heappush(self._heap, (run.tick_at(), next(self._seq), run))
+
+    def _wait_seconds(self):
+        if not self._heap:
+            return None
+        return CLOCK.wait_seconds(self._heap[0][0])
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and self._resume_service is None:
+                    wait = self._wait_seconds()
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+                pending, self._pending = self._pending, []
+                plans, self._plans = self._plans, {}
+                resume, self._resume_service = self._resume_service, None
+
+            try:
+                if resume is not None:
+                    self._resume(resume)
+                if pending:
+                    self._load(pending, plans)
+                self._emit_due()
+            except Exception:
+                log.exception("Report scheduler iteration failed")
+
+    def _load(self, window_uuids, plans):
+        with self._app.app_context():
+            try:
+                windows = ReportWindow.query.filter(ReportWindow.window_uuid.in_(window_uuids)).all()
+                runs = [
+                    WindowRun(w, plans[w.window_uuid] if w.window_uuid in plans else build_slots(w))
+                    for w in windows
+                ]
+                if runs:
+                    db.session.execute(insert(WindowCursor), [cursor_row(run) for run in runs])
+                    db.session.commit()
+                for run in runs:
+                    self._push(run)
+            finally:
+                db.session.remove()
+
+    def _resume(self, service):
+        with self._app.app_context():
+            try:
+                rows = db.session.execute(
+                    select(WindowCursor, ReportWindow)
+                    .join(ReportWindow, ReportWindow.window_uuid == WindowCursor.window_uuid)
+                    .where(WindowCursor.service == service)
+                ).all()
+                runs = [WindowRun(w, decode_plan(c.slot_plan), c.next_index) for c, w in rows]
+
+                skipped = []
+                if RESUME_POLICY == "skip":
+                    now = CLOCK.now()
+                    for run in runs:
+                        skipped.extend(run.skip_past_due(now))
+                    if skipped:
+                        db.session.execute(insert(ReportAudit), skipped)
+                    advance_cursors(runs)
+                    db.session.commit()
+            finally:
+                db.session.remove()
+
+        for run in runs:
+            if run.index < len(run.slots):
+                self._push(run)
+        log.info(
+            "Resumed %d unfinished windows for %s (policy=%s, %d ticks skipped)",
+            len(runs), service, RESUME_POLICY, len(skipped),
+        )
+
+    def _emit_due(self):
+        now = CLOCK.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        if not due:
             return
 
-        # --- Pre-compute deterministic slot schedule ---
-        total_ticks = int((w.window_to - w.window_from).total_seconds() // 10) + 1
-        n_errors_raw = round(w.error_status_generado * total_ticks)
-        n_omitted    = max(1, round(w.error_status_no_reportado * total_ticks))  # siempre al menos 1 omitido
-
-        # Asegura que quede espacio para el omitido y no se generen negativos
-        n_errors = min(n_errors_raw, max(0, total_ticks - n_omitted))
-        n_ok     = max(0, total_ticks - n_errors - n_omitted)
-
-        slots = ["error"] * n_errors + ["no_reported"] * n_omitted + ["ok"] * n_ok
-        random.shuffle(slots)
-
-        tick = w.window_from
-        for slot in slots:
-            if slot == "no_reported":
-                audit_status   = "no_reported"
-                payload_status = "ok"   # no se enviará
-                sent           = False
-            elif slot == "error":
-                payload_status = f"error:simulated_error_{uuid4()}"
-                audit_status   = payload_status
-                sent           = True
-            else:
-                payload_status = "ok"
-                audit_status   = "ok"
-                sent           = True
-
-            payload = {
-                "service":     w.service,
-                "status":      payload_status,
-                "window_uuid": w.window_uuid,
-                "window_from": iso_z(w.window_from),
-                "window_to":   iso_z(w.window_to),
-                "timestamp":   iso_z(tick),
-            }
-
-            # Auditoría SIEMPRE
-            audit = ReportAudit(
-                window_uuid=w.window_uuid,
-                service=w.service,
-                status=audit_status,
-                window_from=w.window_from,
-                window_to=w.window_to,
-                timestamp=tick,
-                sent_to_queue=sent,
-            )
-            db.session.add(audit)
-            db.session.commit()
-
-            # Publicar solo si no fue omitido
-            if sent:
-                r.xadd("reports", {"payload": json.dumps(payload)})
-
-            time.sleep(10)
-            tick = tick + timedelta(seconds=10)
-
-def start_window_async(window_uuid: str):
-    t = threading.Thread(target=_run_window, args=(window_uuid,), daemon=True)
-    t.start()
+        audits, payloads = [], []
+        for run in due:
+            audit, payload = run.next_report()
+            audits.append(audit)
+            if payload is not None:
+                payloads.append(payload)
+            run.index += 1
+
+        with self._app.app_context():
+            try:
+                # Auditoría SIEMPRE, y durable antes de publicar; el cursor avanza con ella
+                db.session.execute(insert(ReportAudit), audits)
+                advance_cursors(due)
+                db.session.commit()
+                committed = True
+            except Exception:
+                db.session.rollback()
+                committed = False
+                log.exception("Audit insert failed; %d ticks dropped", len(audits))
+            finally:
+                db.session.remove()
+
+        if committed and payloads:
+            pipe = self._redis.pipeline(transaction=False)
+            for payload in payloads:
+                pipe.xadd(
+                    stream_for(payload["service"]),
+                    {"payload": json.dumps(payload)},
+                    maxlen=REPORTS_STREAM_MAXLEN or None,
+                    approximate=True,
+                )
+            try:
+                pipe.execute()
+            except Exception:
+                log.exception("Publishing %d reports failed", len(payloads))
+
+        for run in due:
+            if run.index < len(run.slots):
+                self._push(run)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReportScheduler(current_app._get_current_object()).start()
+        return _scheduler
+
+def schedule_windows(window_uuids, plans=None):
+    get_scheduler().add(list(window_uuids), plans)
+
+def resume_windows(app):
+    with app.app_context():
+        get_scheduler().resume(app.config["SERVICE_NAME"])
@@ -0,0 +1,209 @@
+"""
+SQLAlchemy instrumentation shared by the Flask services.
+
+Hooks engine events (`before_cursor_execute` / `after_cursor_execute`) and the
+connection pool (`checkout` / `checkin`, plus timing of `Pool.connect`) to
+record, per Flask route: requests, queries, SQL time and time spent waiting for
+a pooled connection. Statements are aggregated by their normalized text; the
+ones slower than SQL_SLOW_MS are logged and counted, and a request that runs
+the same statement SQL_N_PLUS_ONE_THRESHOLD times or more is logged as an N+1
+suspect. Everything is exposed on GET /metrics in the Prometheus text format.
+
+This file is copied verbatim into each service, since every service is built
+from its own Docker context; keep the copies identical.
+
+    sql_metrics = SQLMetrics()
+    sql_metrics.instrument_engine(engine)
+    sql_metrics.init_app(app)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+BACKGROUND = "<background>"
+_WHITESPACE = re.compile(r"\s+")
+_PARAM = r"(?:%s|%\(\w+\)s|\?|:\w+)"
+_TUPLE = rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)"
+_VALUES_ROWS = re.compile(rf"{_TUPLE}(?:\s*,\s*{_TUPLE})+")
+_IN_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})+\s*\)")
+
+
+def normalize(statement: str, limit: int = 200) -> str:
+    """Collapse whitespace, multi-row `VALUES (...), (...)` and `IN (?, ?, ...)` lists
+    so equivalent statements group together."""
+    text = _WHITESPACE.sub(" ", statement).strip()
+    text = _IN_LIST.sub("(...)", _VALUES_ROWS.sub("(...)", text))
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class SQLMetrics:
+    def __init__(
+        self,
+        slow_ms: float | None = None,
+        n_plus_one_threshold: int | None = None,
+        top_statements: int = 20,
+    ) -> None:
+        self.slow_s = (slow_ms if slow_ms is not None else float(os.getenv("SQL_SLOW_MS", 200))) / 1000
+        self.n_plus_one_threshold = (
+            n_plus_one_threshold
+            if n_plus_one_threshold is not None
+            else int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 10))
+        )
+        self.top_statements = top_statements
+        self._lock = threading.Lock()
+        # (route, method) -> [requests, queries, sql_seconds, pool_wait_seconds, n_plus_one]
+        self._routes = defaultdict(lambda: [0, 0, 0.0, 0.0, 0])
+        # statement -> [calls, seconds, max_seconds, slow_calls]
+        self._statements = defaultdict(lambda: [0, 0.0, 0.0, 0])
+        self._pools: list = []
+        self._checkouts = 0
+
+    # --- wiring -------------------------------------------------------------
+
+    def instrument_engine(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine.pool, "checkout", self._on_checkout)
+
+        pool = engine.pool
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                self._record_pool_wait(time.perf_counter() - started)
+
+        pool.connect = timed_connect
+        self._pools.append(pool)
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule("/metrics", "sql_metrics", self._metrics_view, methods=["GET"])
+
+    # --- request scope ------------------------------------------------------
+
+    @staticmethod
+    def _route() -> tuple:
+        if not has_request_context():
+            return BACKGROUND, ""
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        return rule, request.method
+
+    def _start_request(self) -> None:
+        g.sql_statement_calls = defaultdict(int)
+
+    def _finish_request(self, _exc) -> None:
+        key = self._route()
+        calls = g.pop("sql_statement_calls", None) or {}
+        repeated = {s: n for s, n in calls.items() if n >= self.n_plus_one_threshold}
+        with self._lock:
+            self._routes[key][0] += 1
+            if repeated:
+                self._routes[key][4] += 1
+        for statement, count in repeated.items():
+            log.warning("Possible N+1: %s %s ran %d times: %s", key[1], key[0], count, statement)
+
+    # --- engine / pool events -----------------------------------------------
+
+    # The start time lives on the per-statement execution context, so a statement
+    # that fails (no after_cursor_execute) leaves nothing behind on the connection.
+    def _before_execute(self, _conn, _cursor, _statement, _params, context, _executemany) -> None:
+        context._sql_metrics_started = time.perf_counter()
+
+    def _after_execute(self, _conn, _cursor, statement, _params, context, _executemany) -> None:
+        elapsed = time.perf_counter() - context._sql_metrics_started
+        text = normalize(statement)
+        key = self._route()
+        slow = elapsed >= self.slow_s
+        with self._lock:
+            route = self._routes[key]
+            route[1] += 1
+            route[2] += elapsed
+            stats = self._statements[text]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            if slow:
+                stats[3] += 1
+        if slow:
+            log.warning("Slow SQL (%.0f ms) in %s %s: %s", elapsed * 1000, key[1], key[0], text)
+        if has_request_context() and "sql_statement_calls" in g:
+            g.sql_statement_calls[text] += 1
+
+    def _on_checkout(self, _dbapi_conn, _record, _proxy) -> None:
+        with self._lock:
+            self._checkouts += 1
+
+    def _record_pool_wait(self, elapsed: float) -> None:
+        key = self._route()
+        with self._lock:
+            self._routes[key][3] += elapsed
+
+    # --- exposition ---------------------------------------------------------
+
+    def render(self) -> str:
+        with self._lock:
+            routes = {key: list(values) for key, values in self._routes.items()}
+            statements = sorted(
+                ((text, list(values)) for text, values in self._statements.items()),
+                key=lambda item: item[1][1],
+                reverse=True,
+            )[: self.top_statements]
+            checkouts = self._checkouts
+
+        lines = []
+        route_metrics = (
+            ("sql_requests_total", "counter", "Requests served per route", 0),
+            ("sql_queries_total", "counter", "SQL statements executed per route", 1),
+            ("sql_query_seconds_total", "counter", "Time spent executing SQL per route", 2),
+            ("sql_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection per route", 3),
+            ("sql_n_plus_one_requests_total", "counter", "Requests that repeated one statement N+1 times", 4),
+        )
+        for name, kind, help_text, index in route_metrics:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (rule, method), values in sorted(routes.items()):
+                lines.append(f'{name}{{route="{_label(rule)}",method="{method}"}} {values[index]}')
+
+        statement_metrics = (
+            ("sql_statement_calls_total", "counter", "Executions of the most expensive statements", 0),
+            ("sql_statement_seconds_total", "counter", "Total time of the most expensive statements", 1),
+            ("sql_statement_max_seconds", "gauge", "Slowest single execution of the statement", 2),
+            ("sql_statement_slow_total", "counter", "Executions slower than SQL_SLOW_MS", 3),
+        )
+        for name, kind, help_text, index in statement_metrics:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for text, values in statements:
+                lines.append(f'{name}{{statement="{_label(text)}"}} {values[index]}')
+
+        lines += [
+            "# HELP sql_pool_checkouts_total Connections checked out of the pool",
+            "# TYPE sql_pool_checkouts_total counter",
+            f"sql_pool_checkouts_total {checkouts}",
+            "# HELP sql_pool_checked_out Connections currently checked out",
+            "# TYPE sql_pool_checked_out gauge",
+        ]
+        for index, pool in enumerate(self._pools):
+            checked_out = getattr(pool, "checkedout", None)
+            if checked_out is not None:
+                lines.append(f'sql_pool_checked_out{{pool="{index}"}} {checked_out()}')
+        return "\n".join(lines) + "\n"
+
+    def _metrics_view(self) -> Response:
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import case, func, select
+
+from . import db
+from .cursors import WindowCursor
+from .models import ReportAudit
+
+# Índice que cubre la consulta agregada de estadísticas por ventana.
+AUDIT_STATS_INDEX = db.Index(
+    "ix_audit_window_status_sent",
+    ReportAudit.window_uuid,
+    ReportAudit.status,
+    ReportAudit.sent_to_queue,
+)
+
+CACHE_SIZE = 10000
+MAX_BULK_UUIDS = 1000
+
+# Estadísticas de ventanas ya terminadas: no cambian, así que se guardan en memoria.
+_closed_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _empty_stats(window_uuid):
+    return {
+        "ok": True,
+        "window_uuid": window_uuid,
+        "audit_total": 0,
+        "sent_to_queue": 0,
+        "no_reported": 0,
+        "ok_count": 0,
+        "error_count": 0,
+        "skipped_count": 0,
+    }
+
+
+def _aggregate(window_uuids):
+    """Una sola consulta GROUP BY con agregados condicionales para todas las ventanas."""
+    result = db.session.execute(
+        select(
+            ReportAudit.window_uuid,
+            func.count().label("total"),
+            func.sum(case((ReportAudit.sent_to_queue.is_(True), 1), else_=0)).label("sent"),
+            func.sum(case((ReportAudit.status == "no_reported", 1), else_=0)).label("no_reported"),
+            func.sum(case((ReportAudit.status == "ok", 1), else_=0)).label("ok"),
+            func.sum(case((ReportAudit.status.like("error:%"), 1), else_=0)).label("err"),
+            func.sum(case((ReportAudit.status == "skipped", 1), else_=0)).label("skipped"),
+        )
+        .where(ReportAudit.window_uuid.in_(window_uuids))
+        .group_by(ReportAudit.window_uuid)
+    )
+    stats = {uuid: _empty_stats(uuid) for uuid in window_uuids}
+    for row in result:
+        stats[row.window_uuid].update({
+            "audit_total":   int(row.total),
+            "sent_to_queue": int(row.sent or 0),
+            "no_reported":   int(row.no_reported or 0),
+            "ok_count":      int(row.ok or 0),
+            "error_count":   int(row.err or 0),
+            "skipped_count": int(row.skipped or 0),
+        })
+    return stats
+
+
+def _active_windows(window_uuids):
+    """Ventanas con cursor, es decir, a las que aún les quedan ticks por emitir."""
+    return set(db.session.execute(
+        select(WindowCursor.window_uuid).where(WindowCursor.window_uuid.in_(window_uuids))
+    ).scalars())
+
+
+def window_stats_many(window_uuids):
+    window_uuids = list(dict.fromkeys(window_uuids))
+    stats = {}
+    with _cache_lock:
+        for uuid in window_uuids:
+            if uuid in _closed_cache:
+                _closed_cache.move_to_end(uuid)
+                stats[uuid] = _closed_cache[uuid]
+
+    missing = [uuid for uuid in window_uuids if uuid not in stats]
+    if missing:
+        # El cursor se borra en la misma transacción que la auditoría del último
+        # tick, así que se lee antes de agregar: sin cursor, la agregación ya está
+        # completa. Antes de que el scheduler cargue la ventana tampoco hay cursor,
+        # pero tampoco auditorías, y esas ventanas no se cachean.
+        active = _active_windows(missing)
+        fresh = _aggregate(missing)
+        finished = [
+            uuid for uuid in missing
+            if uuid not in active and fresh[uuid]["audit_total"] > 0
+        ]
+        with _cache_lock:
+            for uuid in finished:
+                _closed_cache[uuid] = fresh[uuid]
+            while len(_closed_cache) > CACHE_SIZE:
+                _closed_cache.popitem(last=False)
+        stats.update(fresh)
+
+    return {uuid: stats[uuid] for uuid in window_uuids}
@@ -8,6 +8,8 @@ from flask_restful import Api, Resource
 from sqlalchemy import DateTime, Integer, String, Text, create_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, scoped_session, sessionmaker
 
+from sql_metrics import SQLMetrics
+
 
 class Base(DeclarativeBase):
     pass
@@ -34,12 +36,15 @@ PORT = int(os.getenv("PORT", "8080"))
 
 connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
 engine = create_engine(DB_URL, future=True, connect_args=connect_args)
+sql_metrics = SQLMetrics()
+sql_metrics.instrument_engine(engine)
 SessionLocal = scoped_session(
     sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 )
 Base.metadata.create_all(engine)
 
 app = Flask(__name__)
+sql_metrics.init_app(app)
 CORS(app, origins="*")
 api = Api(app)
 
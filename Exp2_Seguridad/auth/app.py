@@ -13,6 +13,8 @@ from sqlalchemy import Boolean, DateTime, Integer, String, Text, create_engine,
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, scoped_session, sessionmaker
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from sql_metrics import SQLMetrics
+
 
 class Base(DeclarativeBase):
     pass
@@ -62,12 +64,16 @@ JWT_SECRET = os.getenv("JWT_SECRET", "change-me")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 REDIS_URL = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
+# Stream único que consume auth-queue; no sigue el particionado reports:<k> de Exp1
 STREAM_NAME = os.getenv("STREAM_NAME", "reports")
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "100000"))
 PORT = int(os.getenv("PORT", "8080"))
 SEED_USERS = os.getenv("AUTH_SEED_USERS", "user1:user1:user,user2:user2:user,user3:user3:user,user4:user4:user,user5:user5:user")
 
 connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
 engine = create_engine(DB_URL, future=True, connect_args=connect_args)
+sql_metrics = SQLMetrics()
+sql_metrics.instrument_engine(engine)
 SessionLocal = scoped_session(sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False))
 Base.metadata.create_all(engine)
 
@@ -79,6 +85,7 @@ except Exception:
 
 
 app = Flask(__name__)
+sql_metrics.init_app(app)
 CORS(app, origins="*")
 api = Api(app)
 
@@ -175,7 +182,12 @@ def publish_event(user: str, activity: str, status: str, detail: str, metadata:
         "occurred_at": now_utc().isoformat(),
     }
     try:
-        redis_client.xadd(STREAM_NAME, {"payload": json.dumps(payload)})
+        redis_client.xadd(
+            STREAM_NAME,
+            {"payload": json.dumps(payload)},
+            maxlen=STREAM_MAXLEN or None,
+            approximate=True,
+        )
     except Exception:
         return
 